@@ -1,8 +1,58 @@
 """CLI app that is exposed to the project root."""
 
 import typer
+from typing import Literal, Optional
+from performance.src.core.cli import app as bench_app
 from performance.src.mock_data.cli import app as mock_app
+from performance.src.utilities import tracing
 
 app = typer.Typer(rich_markup_mode="rich")
 
+
+@app.callback()
+def main(
+    ctx: typer.Context,
+    trace_file: Optional[str] = typer.Option(
+        None, help="Record nested timing spans and resource samples of the command to this file"
+    ),
+    trace_format: Literal["chrome", "json"] = typer.Option(
+        "chrome", help="Format of the trace file, chrome traces can be opened in https://ui.perfetto.dev"
+    ),
+    sample_interval: float = typer.Option(
+        0.5, help="Seconds between CPU, memory and disk samples while tracing, 0 disables sampling"
+    ),
+    live_dir: Optional[str] = typer.Option(
+        None,
+        envvar="DB_PERF_LIVE_DIR",
+        help=f"Publish spans and resource samples of the command for the UI dashboard, e.g. {tracing.DEFAULT_LIVE_DIR}",
+    ),
+) -> None:
+    """Performance testing toolkit for databases"""
+    # The dashboard itself is not a benchmark, it only reads the sessions of other commands
+    if (trace_file or live_dir) and ctx.invoked_subcommand != "ui":
+        tracing.start(trace_file, trace_format=trace_format, sample_interval=sample_interval, live_dir=live_dir)
+        ctx.call_on_close(tracing.finish)
+
+
+@app.command(help="Serves the dashboard that shows live sessions and the runs recorded in the results store")
+def ui(
+    host: str = typer.Option("127.0.0.1", help="Address the dashboard listens on"),
+    port: int = typer.Option(8000, help="Port the dashboard listens on"),
+    results_db: str = typer.Option(
+        ".results/results.db", envvar="DB_PERF_RESULTS_DB", help="DuckDB file with the recorded benchmark runs"
+    ),
+    live_dir: str = typer.Option(
+        tracing.DEFAULT_LIVE_DIR, envvar="DB_PERF_LIVE_DIR", help="Directory commands run with `--live-dir` publish to"
+    ),
+) -> None:
+    """Serves the UI dashboard, requires the `api` dependency group."""
+    import os
+    import uvicorn
+
+    os.environ["DB_PERF_RESULTS_DB"] = results_db
+    os.environ["DB_PERF_LIVE_DIR"] = live_dir
+    uvicorn.run("ui.src.main:app", host=host, port=port)
+
+
 app.add_typer(mock_app, name="mock", help="Generates mock datasets that can be used for performance testing")
+app.add_typer(bench_app, name="bench", help="Runs benchmark query suites against databases")
@@ -0,0 +1,249 @@
+"""CLI that runs benchmark query suites"""
+
+import typer
+from typing import List, Literal, Optional
+from performance.src.enums import DBType
+from performance.src.utilities.common import timer
+
+app = typer.Typer(help="Run benchmark query suites")
+
+
+@app.command(help="Run the same query suite on one or more engines and compare the results side by side")
+@timer
+def queries(
+    engines: List[DBType] = typer.Option([DBType.DUCKDB.value], "--engine", help="Engine to run the suite on"),
+    database: Optional[str] = typer.Option(None, help="DuckDB database file that holds the benchmark tables"),
+    sql_path: str = typer.Option("sqls/tcp_ds", help="Path of the DuckDB dialect query suite to run"),
+    iterations: int = typer.Option(3, help="Number of times each query is executed"),
+    cache_dir: str = typer.Option(".cache/translated_queries", help="Cache for the dialect translated queries"),
+    results_db: str = typer.Option(".results/results.db", help="DuckDB database the results are recorded in"),
+    timeout: Optional[float] = typer.Option(None, help="Seconds after which a query is cancelled"),
+    memory_limit_mb: Optional[int] = typer.Option(None, help="Memory ceiling per query in MB"),
+    mode: Literal["warm", "cold", "both"] = typer.Option(
+        "warm", help="Cache state every measured execution starts from, both runs cold and then warm"
+    ),
+    warmup: int = typer.Option(1, help="Unrecorded executions of each query before the warm measurements"),
+    cache_paths: Optional[List[str]] = typer.Option(
+        None, "--cache-path", help="Data files read by the queries, evicted from the page cache before cold runs"
+    ),
+) -> None:
+    """Command to run a query suite on multiple engines"""
+    from performance.src.core.engines import CONNECTED_ENGINES
+    from performance.src.core.modes import run_cold, run_warm
+    from performance.src.core.results import ResultsStore
+    from performance.src.core.translation import translate_suite
+    from performance.src.utilities.common import format_table
+
+    for engine in engines:
+        if engine not in CONNECTED_ENGINES:
+            raise typer.BadParameter(f"Queries can't be run on {engine.value} yet", param_hint="--engine")
+
+    store = ResultsStore(results_db)
+    run_id = store.new_run_id()
+    connection_options = {DBType.DUCKDB: {"database": database}}
+
+    for engine in engines:
+        suite, excluded = translate_suite(sql_path, engine, cache_dir=cache_dir)
+        if excluded:
+            print(f"[{engine.value}] skipping queries: {', '.join(excluded)}", flush=True)
+        options = connection_options.get(engine, {})
+        limits = {"timeout": timeout, "memory_limit_mb": memory_limit_mb}
+        # Cold runs go first so this process doesn't hold the database file open while the fresh processes run
+        if mode in ("cold", "both"):
+            store.record(run_id, run_cold(engine, suite, iterations, options, cache_paths=cache_paths, **limits))
+        if mode in ("warm", "both"):
+            store.record(run_id, run_warm(engine, suite, iterations, options, warmup=warmup, **limits))
+
+    print(f"Results of run {run_id} recorded in {results_db}", flush=True)
+    if mode == "both":
+        print(format_table(store.compare_modes(run_id)), flush=True)
+    else:
+        print(format_table(store.compare(run_id, [engine.value for engine in engines])), flush=True)
+
+
+@app.command(help="Translate a query suite to the dialect of one or more engines and cache the translations")
+@timer
+def translate(
+    engines: List[DBType] = typer.Option(..., "--engine", help="Engine to translate the suite for"),
+    sql_path: str = typer.Option("sqls/tcp_ds", help="Path of the DuckDB dialect query suite to translate"),
+    cache_dir: str = typer.Option(".cache/translated_queries", help="Cache for the dialect translated queries"),
+) -> None:
+    """Command to translate a query suite"""
+    from performance.src.core.translation import translate_suite
+
+    for engine in engines:
+        suite, excluded = translate_suite(sql_path, engine, cache_dir=cache_dir)
+        print(f"[{engine.value}] {len(suite)} queries translated, {len(excluded)} excluded", flush=True)
+
+
+@app.command(help="Check translated queries by comparing their output with the original queries in DuckDB")
+@timer
+def verify_translation(
+    database: str = typer.Option(..., help="Small scale factor DuckDB database that holds the benchmark tables"),
+    engine: DBType = typer.Option(DBType.POSTGRESQL.value, help="Engine whose translation is checked"),
+    sql_path: str = typer.Option("sqls/tcp_ds", help="Path of the DuckDB dialect query suite"),
+    cache_dir: str = typer.Option(".cache/translated_queries", help="Cache for the dialect translated queries"),
+    exclude: bool = typer.Option(False, help="Add mismatching queries to the exclusion list of the engine"),
+) -> None:
+    """Command to verify query translations offline"""
+    from performance.src.core.translation import add_exclusions, verify_translation as verify
+
+    problems = verify(database, sql_path, engine=engine, cache_dir=cache_dir)
+    for query_id, problem in problems.items():
+        print(f"[{engine.value}] query {query_id}: {problem}", flush=True)
+    if problems and exclude:
+        add_exclusions(sql_path, engine, problems)
+    print(f"[{engine.value}] {len(problems)} translated queries differ from the original", flush=True)
+    if problems and not exclude:
+        raise typer.Exit(code=1)
+
+
+@app.command(help="Apply TPC-H refresh streams between query streams and report refresh throughput and query drift")
+@timer
+def refresh(
+    engine: DBType = typer.Option(DBType.DUCKDB.value, help="Engine with the TPC-H tables, duckdb or postgresql"),
+    database: Optional[str] = typer.Option(None, help="DuckDB database with a copy of the initial TPC-H load"),
+    sql_path: str = typer.Option("sqls/tcp_h", help="Path of the DuckDB dialect TPC-H query suite"),
+    refresh_path: str = typer.Option(
+        "tpc_h_refresh", help="Path of the refresh datasets created by mock tpc-h-refresh"
+    ),
+    refresh_streams: Optional[int] = typer.Option(None, help="Number of refresh streams to apply, defaults to all"),
+    method: Literal["batched", "merge"] = typer.Option("batched", help="Apply refreshes with INSERT/DELETE or MERGE"),
+    batch_size: int = typer.Option(10000, help="Rows staged and applied per statement"),
+    cache_dir: str = typer.Option(".cache/translated_queries", help="Cache for the dialect translated queries"),
+    results_db: str = typer.Option(".results/results.db", help="DuckDB database the results are recorded in"),
+    timeout: Optional[float] = typer.Option(None, help="Seconds after which a query is cancelled"),
+    memory_limit_mb: Optional[int] = typer.Option(None, help="Memory ceiling per query in MB"),
+) -> None:
+    """Command to benchmark TPC-H refresh functions"""
+    from performance.src.core.engines import connect
+    from performance.src.core.refresh import run_refresh_benchmark
+    from performance.src.core.results import ResultsStore
+    from performance.src.core.translation import translate_suite
+    from performance.src.utilities.common import format_table
+
+    if engine not in (DBType.DUCKDB, DBType.POSTGRESQL):
+        raise typer.BadParameter(f"Refresh streams can't be applied on {engine.value} yet", param_hint="--engine")
+
+    suite, _ = translate_suite(sql_path, engine, cache_dir=cache_dir)
+    store = ResultsStore(results_db)
+    run_id = store.new_run_id()
+    with connect(engine, **({"database": database} if engine == DBType.DUCKDB else {})) as connection:
+        results = run_refresh_benchmark(
+            connection,
+            suite,
+            refresh_path,
+            store,
+            run_id,
+            engine=engine.value,
+            refresh_streams=refresh_streams,
+            method=method,
+            batch_size=batch_size,
+            timeout=timeout,
+            memory_limit_mb=memory_limit_mb,
+        )
+
+    print(f"Results of run {run_id} recorded in {results_db}", flush=True)
+    print(format_table(results), flush=True)
+    print(format_table(store.drift(run_id)), flush=True)
+
+
+@app.command(help="Run query templates with parameters drawn from the data, ad hoc and as prepared statements")
+@timer
+def templates(
+    engine: DBType = typer.Option(DBType.DUCKDB.value, help="Engine with the benchmark tables, duckdb or postgresql"),
+    database: Optional[str] = typer.Option(None, help="DuckDB database file that holds the benchmark tables"),
+    template_path: str = typer.Option(
+        "sqls/tcp_ds_templates", help="Path of the DuckDB dialect query templates and their parameters.json"
+    ),
+    streams: int = typer.Option(1, help="Number of query streams, each draws its parameters with its own seed"),
+    variants: int = typer.Option(5, help="Parameter sets drawn per template and stream"),
+    seed: int = typer.Option(0, help="Seed the parameter sets of the streams are derived from"),
+    method: Literal["adhoc", "prepared", "both"] = typer.Option(
+        "both", help="Inline the parameters and re-plan every execution, execute prepared statements, or both"
+    ),
+    iterations: int = typer.Option(3, help="Number of times each variant is executed"),
+    warmup: int = typer.Option(1, help="Unrecorded executions of each variant before the measurements"),
+    cache_dir: str = typer.Option(".cache/translated_queries", help="Cache for the dialect translated queries"),
+    results_db: str = typer.Option(".results/results.db", help="DuckDB database the results are recorded in"),
+    timeout: Optional[float] = typer.Option(None, help="Seconds after which a query is cancelled"),
+    memory_limit_mb: Optional[int] = typer.Option(None, help="Memory ceiling per query in MB"),
+) -> None:
+    """Command to run parameterized query streams"""
+    from performance.src.core.engines import connect
+    from performance.src.core.results import ResultsStore
+    from performance.src.core.templates import run_template_streams
+    from performance.src.utilities.common import format_table
+
+    if engine not in (DBType.DUCKDB, DBType.POSTGRESQL):
+        raise typer.BadParameter(f"Prepared statements can't be run on {engine.value} yet", param_hint="--engine")
+
+    store = ResultsStore(results_db)
+    run_id = store.new_run_id()
+    with connect(engine, **({"database": database} if engine == DBType.DUCKDB else {})) as connection:
+        results = run_template_streams(
+            connection,
+            template_path,
+            engine=engine,
+            streams=streams,
+            variants=variants,
+            seed=seed,
+            method=method,
+            iterations=iterations,
+            warmup=warmup,
+            cache_dir=cache_dir,
+            timeout=timeout,
+            memory_limit_mb=memory_limit_mb,
+        )
+    store.record(run_id, results)
+
+    print(f"Results of run {run_id} recorded in {results_db}", flush=True)
+    print(format_table(store.variant_spread(run_id)), flush=True)
+    print(format_table(store.prepared_overhead(run_id)), flush=True)
+
+
+@app.command(help="Compare selective TPC-DS queries on the default and the sorted, bloom filtered Parquet layout")
+@timer
+def pruning(
+    database: Optional[str] = typer.Option(None, help="DuckDB database with TPC-DS tables, generated if not given"),
+    scale_factor: float = typer.Option(1, help="Scale factor used when the TPC-DS tables are generated"),
+    sql_path: str = typer.Option("sqls/tcp_ds", help="Path of the TPC-DS query suite"),
+    work_dir: str = typer.Option(".tmp/pruning", help="Directory the Parquet layouts are exported to"),
+    iterations: int = typer.Option(3, help="Number of times each query is executed"),
+    row_group_size: int = typer.Option(122880, help="Rows per row group of the optimized layout"),
+    results_db: str = typer.Option(".results/results.db", help="DuckDB database the results are recorded in"),
+) -> None:
+    """Command to benchmark row group pruning"""
+    from performance.src.core.pruning import run_pruning_benchmark
+    from performance.src.utilities.common import format_table
+
+    comparison = run_pruning_benchmark(
+        database,
+        scale_factor,
+        sql_path=sql_path,
+        work_dir=work_dir,
+        results_db=results_db,
+        iterations=iterations,
+        row_group_size=row_group_size,
+    )
+    print(format_table(comparison), flush=True)
+
+
+@app.command(help="Compare write throughput, size and DuckDB scan times of file formats and compression codecs")
+@timer
+def formats(
+    source: str = typer.Option(
+        ..., help="Parquet or CSV file (or glob) of a generated table, e.g. mock employee output"
+    ),
+    work_dir: str = typer.Option(".tmp/formats", help="Directory the format combinations are exported to"),
+    project_column: Optional[str] = typer.Option(
+        None, help="Column used by the projection and filtered scans, defaults to the first column"
+    ),
+    zstd_levels: Optional[List[int]] = typer.Option(None, "--zstd-level", help="Parquet zstd level to benchmark"),
+) -> None:
+    """Command to benchmark file formats and compression codecs"""
+    from performance.src.core.formats import run_format_benchmark
+    from performance.src.utilities.common import format_table
+
+    results = run_format_benchmark(source, work_dir, project_column=project_column, zstd_levels=zstd_levels)
+    print(format_table(results), flush=True)
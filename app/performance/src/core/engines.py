@@ -0,0 +1,43 @@
+"""Creates connection wrappers for the engines a query suite can run on."""
+
+import os
+
+from performance.src.enums import DBType
+
+# Engines `connect` has a connection wrapper for, the others can only be translated to
+CONNECTED_ENGINES = (DBType.DUCKDB, DBType.POSTGRESQL, DBType.SNOWFLAKE)
+
+
+def connect(engine: DBType, **kwargs):
+    """Returns an unopened connection wrapper (context manager exposing `execute_query`) for an engine.
+    Connection parameters that are not passed are read from environment variables,
+    e.g. `POSTGRES_HOST` or `SNOWFLAKE_USER`.
+    """
+    if engine == DBType.DUCKDB:
+        from performance.src.utilities.duckdb import DuckDBConnection
+
+        return DuckDBConnection(database=kwargs.get("database") or ":memory:")
+    elif engine == DBType.POSTGRESQL:
+        from performance.src.utilities.postgres import PostgresConnection
+
+        return PostgresConnection(
+            host=kwargs.get("host") or os.getenv("POSTGRES_HOST", "localhost"),
+            port=kwargs.get("port") or os.getenv("POSTGRES_PORT", "5432"),
+            database=kwargs.get("database") or os.getenv("POSTGRES_DATABASE", "postgres"),
+            user=kwargs.get("user") or os.getenv("POSTGRES_USER", "postgres"),
+            password=kwargs.get("password") or os.getenv("POSTGRES_PASSWORD", ""),
+            conn_args=kwargs.get("conn_args"),
+        )
+    elif engine == DBType.SNOWFLAKE:
+        from performance.src.utilities.snowflake import SnowflakeConnection
+
+        return SnowflakeConnection(
+            user=kwargs.get("user"),
+            password=kwargs.get("password"),
+            account=kwargs.get("account"),
+            warehouse=kwargs.get("warehouse"),
+            database=kwargs.get("database"),
+            schema=kwargs.get("schema"),
+        )
+    else:
+        raise ValueError(f"Running queries on {engine.value} is not supported yet")
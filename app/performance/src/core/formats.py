@@ -0,0 +1,111 @@
+"""Benchmark of file formats and compression codecs for a generated table.
+
+Every combination is written with `DuckDBConnection.export_table` and then scanned by DuckDB three ways: a full
+scan of all columns, a single column projection and a selective filter. Each scan is measured cold (fresh
+connection, files evicted from the OS page cache) and warm (repeated on the same connection).
+"""
+
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+from performance.src.utilities.common import drop_page_cache
+from performance.src.utilities.duckdb import DuckDBConnection
+from performance.src.utilities.tracing import span
+
+# (export_type, compression, compression_level), a level of None uses the codec default
+DEFAULT_COMBINATIONS = [
+    ("csv", None, None),
+    ("csv", "gzip", None),
+    ("csv", "zstd", None),
+    ("parquet", "uncompressed", None),
+    ("parquet", "snappy", None),
+    ("parquet", "gzip", None),
+    ("parquet", "lz4", None),
+    ("parquet", "zstd", 1),
+    ("parquet", "zstd", 3),
+    ("parquet", "zstd", 9),
+]
+
+
+def combinations(zstd_levels: Optional[List[int]] = None) -> List[Tuple[str, Optional[str], Optional[int]]]:
+    """Returns the format combinations to benchmark, optionally with a custom set of Parquet zstd levels."""
+    if not zstd_levels:
+        return DEFAULT_COMBINATIONS
+    return [
+        combination for combination in DEFAULT_COMBINATIONS if combination[1] != "zstd" or combination[0] == "csv"
+    ] + [("parquet", "zstd", level) for level in zstd_levels]
+
+
+def read_function(export_type: str, path: Union[str, Path]) -> str:
+    """Returns the DuckDB table function that reads a file or glob of the given export type."""
+    return f"read_parquet('{path}')" if export_type == "parquet" else f"read_csv_auto('{path}')"
+
+
+def _timed(duckdb: DuckDBConnection, query: str, parameters: Optional[List] = None) -> float:
+    """Runs a query to completion and returns its elapsed seconds."""
+    start = time.perf_counter()
+    duckdb.conn.execute(query, parameters).fetchall()
+    return time.perf_counter() - start
+
+
+def scan(files: List[Path], export_type: str, project_column: str, filter_value) -> Dict:
+    """Measures full scan, projection and filtered scan times of an exported (single file) table, cold and warm."""
+    source = read_function(export_type, files[0])
+    scans = {
+        "full_scan": (f"SELECT max(COLUMNS(*)) FROM {source}", None),
+        "projection": (f'SELECT max("{project_column}") FROM {source}', None),
+        "filtered": (f'SELECT * FROM {source} WHERE "{project_column}" <= ?', [filter_value]),
+    }
+
+    timings = {}
+    for name, (query, parameters) in scans.items():
+        drop_page_cache(files)
+        with DuckDBConnection() as duckdb:
+            timings[f"{name}_cold_s"] = _timed(duckdb, query, parameters)
+            timings[f"{name}_warm_s"] = _timed(duckdb, query, parameters)
+    return timings
+
+
+def run_format_benchmark(
+    source: str,
+    work_dir: Union[str, Path],
+    project_column: Optional[str] = None,
+    zstd_levels: Optional[List[int]] = None,
+) -> List[Dict]:
+    """Loads the source table (a Parquet or CSV file or glob) and benchmarks every format combination on it."""
+    with DuckDBConnection() as duckdb:
+        source_type = "parquet" if ".parquet" in source else "csv"
+        duckdb.execute_multiple_queries([f"CREATE TABLE source AS SELECT * FROM {read_function(source_type, source)}"])
+        rows = duckdb.execute_query("SELECT count(*) FROM source")[0][0]
+        project_column = project_column or duckdb.execute_query("DESCRIBE source")[0][0]
+        # The 1% quantile of the projected column makes the filtered scan select roughly 1% of the rows
+        filter_value = duckdb.execute_query(f'SELECT quantile_disc("{project_column}", 0.01) FROM source')[0][0]
+
+        results = []
+        for export_type, compression, compression_level in combinations(zstd_levels):
+            label = "_".join(str(part) for part in (export_type, compression, compression_level) if part is not None)
+            with span("format_benchmark", format=label) as attrs:
+                start = time.perf_counter()
+                duckdb.export_table(
+                    "source",
+                    export_type=export_type,
+                    target_path=Path(work_dir, label),
+                    compression=compression,
+                    compression_level=compression_level,
+                )
+                write_s = time.perf_counter() - start
+                files = sorted(Path(work_dir, label, "source").iterdir())
+                size_bytes = sum(file.stat().st_size for file in files)
+                result = {
+                    "format": label,
+                    "size_mb": size_bytes / 1024**2,
+                    "write_s": write_s,
+                    "write_rows_per_s": int(rows / write_s),
+                    "write_mb_per_s": size_bytes / 1024**2 / write_s,
+                    **scan(files, export_type, project_column, filter_value),
+                }
+                attrs.update(result)
+            results.append(result)
+            print(f"Benchmarked {label}: {result['size_mb']: .2f} MB written in {write_s: .4f} seconds", flush=True)
+    return results
@@ -0,0 +1,85 @@
+"""Cold and warm cache measurement modes for query suites.
+
+A cold execution starts without any cache the engine or the OS could reuse from a previous execution:
+- DuckDB queries run in a freshly spawned process that reopens the database file, so no buffer pool,
+  Parquet metadata cache or compiled state survives, and the OS page cache is dropped before each of them
+  (the whole cache as root, otherwise the database and `cache_paths` files are evicted with fadvise).
+- Other engines get a new connection per execution and, where the wrapper supports it, a disabled result
+  cache (`USE_CACHED_RESULT = FALSE` on Snowflake). Server side buffer caches of remote engines are not touched.
+
+A warm execution reuses one connection after `warmup` unrecorded executions of the same query.
+"""
+
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from performance.src.core.engines import connect
+from performance.src.core.runner import run_queries
+from performance.src.enums import DBType
+from performance.src.utilities.common import drop_os_caches
+from performance.src.utilities.tracing import span
+
+
+def _run_in_fresh_process(database: str, query_id: str, query: str, iteration: int, limits: Dict) -> List[Dict]:
+    """Opens the DuckDB database in the current (fresh) process and runs a single query once."""
+    with connect(DBType.DUCKDB, database=database) as duckdb:
+        return run_queries(
+            duckdb, {query_id: query}, engine=DBType.DUCKDB.value, mode="cold", first_iteration=iteration, **limits
+        )
+
+
+def _prepare(connection) -> None:
+    """Disables the result cache of a connection wrapper that supports it."""
+    if hasattr(connection, "disable_result_cache"):
+        connection.disable_result_cache()
+
+
+def run_cold(
+    engine: DBType,
+    queries: Dict[str, str],
+    iterations: int,
+    connection_options: Dict,
+    cache_paths: Optional[List[str]] = None,
+    **limits,
+) -> List[Dict]:
+    """Runs every query `iterations` times, each execution starting from cold caches."""
+    results = []
+    with span("run_cold", engine=engine.value, queries=len(queries), iterations=iterations) as attrs:
+        for query_id, query in queries.items():
+            for iteration in range(iterations):
+                if engine == DBType.DUCKDB:
+                    database = connection_options.get("database") or ":memory:"
+                    paths = [*(cache_paths or []), *([database] if Path(database).exists() else [])]
+                    attrs["cache_drop"] = drop_os_caches(paths)
+                    # One process per execution, spawned so nothing is inherited from this process
+                    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+                        results.extend(
+                            pool.submit(_run_in_fresh_process, database, query_id, query, iteration, limits).result()
+                        )
+                else:
+                    with connect(engine, **connection_options) as connection:
+                        _prepare(connection)
+                        results.extend(
+                            run_queries(
+                                connection,
+                                {query_id: query},
+                                engine=engine.value,
+                                mode="cold",
+                                first_iteration=iteration,
+                                **limits,
+                            )
+                        )
+    return results
+
+
+def run_warm(
+    engine: DBType, queries: Dict[str, str], iterations: int, connection_options: Dict, warmup: int = 1, **limits
+) -> List[Dict]:
+    """Runs every query `warmup` times unrecorded and then `iterations` times on the same connection."""
+    with connect(engine, **connection_options) as connection:
+        _prepare(connection)
+        return run_queries(
+            connection, queries, iterations=iterations, engine=engine.value, mode="warm", warmup=warmup, **limits
+        )
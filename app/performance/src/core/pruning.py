@@ -0,0 +1,76 @@
+"""Benchmark that shows the effect of the export layout on row group pruning of selective TPC-DS queries."""
+
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+from performance.src.core.queries import load_queries
+from performance.src.core.results import ResultsStore
+from performance.src.core.runner import run_queries
+from performance.src.mock_data.tpc import tpc_ds
+from performance.src.utilities.duckdb import DuckDBConnection
+
+# TPC-DS queries that restrict store_sales to a month or a year through date_dim
+SELECTIVE_QUERIES = ["3", "7", "19", "42", "43", "52", "55"]
+
+# Direct range filter on the sort key, pruning only depends on the file statistics here
+DATE_RANGE_QUERY = """SELECT count(*), sum(ss_net_paid)
+FROM store_sales
+WHERE ss_sold_date_sk BETWEEN 2451180 AND 2451210"""
+
+
+def export_layouts(database: Optional[str], scale_factor: float, work_dir: Path, row_group_size: int) -> Dict:
+    """Exports all TPC-DS tables as Parquet once with the default layout and once sorted with bloom filters.
+    Tables are generated in memory with dsdgen when no database is given. Returns {layout: bytes on disk}.
+    """
+    layouts = {"default": {}, "optimized": {"sort": True, "bloom_filters": True, "row_group_size": row_group_size}}
+    with DuckDBConnection(database=database or ":memory:") as duckdb:
+        if not database:
+            duckdb.execute_multiple_queries(["INSTALL tpcds;", "LOAD tpcds;", f"CALL dsdgen(sf = {scale_factor});"])
+        tables = [table for (table,) in duckdb.execute_query("SHOW TABLES;")]
+        for layout, options in layouts.items():
+            for table in tables:
+                duckdb.export_table(
+                    table,
+                    export_type="parquet",
+                    target_path=Path(work_dir, layout),
+                    **tpc_ds.layout_kwargs(table, **options),
+                )
+
+    return {
+        layout: sum(file.stat().st_size for file in Path(work_dir, layout).rglob("*.parquet")) for layout in layouts
+    }
+
+
+def run_pruning_benchmark(
+    database: Optional[str],
+    scale_factor: float,
+    sql_path: Union[str, Path],
+    work_dir: Union[str, Path],
+    results_db: str,
+    iterations: int = 3,
+    row_group_size: int = 122880,
+    query_ids: Optional[List[str]] = None,
+) -> List[Dict]:
+    """Runs the selective queries against both layouts and returns the side by side comparison."""
+    sizes = export_layouts(database, scale_factor, Path(work_dir), row_group_size)
+    queries = {
+        query_id: query
+        for query_id, query in load_queries(sql_path).items()
+        if query_id in (query_ids or SELECTIVE_QUERIES)
+    }
+    queries["date_range"] = DATE_RANGE_QUERY
+
+    store = ResultsStore(results_db)
+    run_id = store.new_run_id()
+    for layout in sizes:
+        with DuckDBConnection() as duckdb:
+            duckdb.execute_multiple_queries(
+                [
+                    f"CREATE VIEW {table.name} AS SELECT * FROM read_parquet('{table}/**/*.parquet')"
+                    for table in sorted(Path(work_dir, layout).iterdir())
+                ]
+            )
+            store.record(run_id, run_queries(duckdb, queries, iterations=iterations, engine=f"{layout}_layout"))
+        print(f"{layout} layout: {sizes[layout] / 1024**2: .1f} MB on disk", flush=True)
+
+    return store.compare(run_id)
@@ -0,0 +1,25 @@
+"""Loads benchmark query suites exported by the mock data generators."""
+
+from pathlib import Path
+from typing import Dict, Union
+
+QUERY_HEADER_LINE = "*" * 20
+
+
+def read_query_file(path: Union[str, Path]) -> str:
+    """Reads a query file and strips the `Query :: <id>` banner written by the TPC generators."""
+    lines = Path(path).read_text().splitlines()
+    if len(lines) >= 3 and lines[0] == QUERY_HEADER_LINE and lines[2] == QUERY_HEADER_LINE:
+        lines = lines[3:]
+    return "\n".join(lines).strip()
+
+
+def load_queries(sql_path: Union[str, Path]) -> Dict[str, str]:
+    """Returns all `*.sql` files of a query suite as {query_id: sql}, ordered by their numeric id."""
+    files = sorted(
+        Path(sql_path).glob("*.sql"),
+        key=lambda file: (not file.stem.isdigit(), int(file.stem) if file.stem.isdigit() else 0, file.stem),
+    )
+    if not files:
+        raise ValueError(f"No .sql files found in {sql_path}")
+    return {file.stem: read_query_file(file) for file in files}
@@ -0,0 +1,129 @@
+"""TPC-H refresh benchmark that interleaves the refresh functions with query streams.
+
+A query stream runs once on the initial load and once more after every refresh stream, so query latencies can be
+compared as inserts and deletes accumulate. A refresh stream applies RF1 (insert new orders and their lineitems)
+and then RF2 (delete old orders and their lineitems) from the datasets of `tpc_h.create_refresh_sets`, in batches
+that are staged on the engine and applied either with INSERT/DELETE statements or with MERGE
+(PostgreSQL 15 or newer). The refreshes change the benchmark tables, run it on a copy of the initial load.
+"""
+
+import time
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Union
+
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+from performance.src.core.results import ResultsStore
+from performance.src.core.runner import run_queries
+from performance.src.mock_data.tpc.tpc_h import refresh_stream_path
+from performance.src.utilities.tracing import span
+
+# Key columns RF1 rows are matched on when they are merged
+MERGE_KEYS = {"orders": ["o_orderkey"], "lineitem": ["l_orderkey", "l_linenumber"]}
+
+# Refresh order of the tables, orders are inserted before and deleted after their lineitems
+RF1_TABLES = ["orders", "lineitem"]
+RF2_TABLES = {"lineitem": "l_orderkey", "orders": "o_orderkey"}
+
+
+def count_refresh_streams(refresh_path: Union[str, Path]) -> int:
+    """Returns the number of refresh streams created in a directory."""
+    return len(list(Path(refresh_path).glob("stream_*")))
+
+
+def _batches(path: Path, batch_size: int) -> Iterator[pa.RecordBatch]:
+    """Reads the Parquet files of a refresh dataset in batches of at most `batch_size` rows."""
+    for batch in ds.dataset(path, format="parquet").to_batches(batch_size=batch_size):
+        if batch.num_rows:
+            yield batch
+
+
+def apply_rf1(connection, stream_path: Path, method: str = "batched", batch_size: int = 10000) -> int:
+    """Inserts the new orders and lineitems of a refresh stream. Returns the number of inserted orders."""
+    orders = 0
+    for table in RF1_TABLES:
+        stage = f"stage_{table}"
+        for batch in _batches(Path(stream_path, f"rf1_{table}"), batch_size):
+            connection.stage_batch(stage, table, batch)
+            columns = ", ".join(batch.schema.names)
+            if method == "merge":
+                condition = " AND ".join(f"{table}.{key} = {stage}.{key}" for key in MERGE_KEYS[table])
+                values = ", ".join(f"{stage}.{column}" for column in batch.schema.names)
+                query = f"""MERGE INTO {table} USING {stage} ON {condition}
+                    WHEN NOT MATCHED THEN INSERT ({columns}) VALUES ({values})"""
+            else:
+                query = f"INSERT INTO {table} ({columns}) SELECT {columns} FROM {stage}"
+            connection.execute_multiple_queries([query])
+            if table == "orders":
+                orders += batch.num_rows
+    return orders
+
+
+def apply_rf2(connection, stream_path: Path, method: str = "batched", batch_size: int = 10000) -> int:
+    """Deletes the orders of a refresh stream and their lineitems. Returns the number of deleted orders."""
+    orders = 0
+    for batch in _batches(Path(stream_path, "rf2_orders"), batch_size):
+        connection.stage_batch("stage_delete", "orders", batch)
+        if method == "merge":
+            queries = [
+                f"""MERGE INTO {table} USING stage_delete ON {table}.{key} = stage_delete.o_orderkey
+                    WHEN MATCHED THEN DELETE"""
+                for table, key in RF2_TABLES.items()
+            ]
+        else:
+            queries = [
+                f"DELETE FROM {table} WHERE {key} IN (SELECT o_orderkey FROM stage_delete)"
+                for table, key in RF2_TABLES.items()
+            ]
+        connection.execute_multiple_queries(queries)
+        orders += batch.num_rows
+    return orders
+
+
+def run_refresh_benchmark(
+    connection,
+    queries: Dict[str, str],
+    refresh_path: Union[str, Path],
+    store: ResultsStore,
+    run_id: str,
+    engine: str = "duckdb",
+    refresh_streams: Optional[int] = None,
+    method: str = "batched",
+    batch_size: int = 10000,
+    **limits,
+) -> List[Dict]:
+    """Runs a query stream, then every refresh stream followed by another query stream, on an open connection.
+    Query results are recorded in the store with the number of applied refresh streams as iteration and mode
+    `refresh`. Returns the elapsed time and throughput of every refresh function.
+    """
+    refresh_streams = refresh_streams or count_refresh_streams(refresh_path)
+    store.record(run_id, run_queries(connection, queries, engine=engine, mode="refresh", **limits))
+
+    results = []
+    for stream in range(1, refresh_streams + 1):
+        for function, apply in (("RF1", apply_rf1), ("RF2", apply_rf2)):
+            with span("refresh_function", engine=engine, stream=stream, function=function, method=method) as attrs:
+                start = time.perf_counter()
+                orders = apply(connection, refresh_stream_path(refresh_path, stream), method, batch_size)
+                elapsed = time.perf_counter() - start
+                attrs["orders"] = orders
+            results.append(
+                {
+                    "engine": engine,
+                    "refresh_stream": stream,
+                    "function": function,
+                    "method": method,
+                    "orders": orders,
+                    "elapsed_s": elapsed,
+                    "orders_per_s": orders / elapsed if elapsed else None,
+                }
+            )
+            print(
+                f"[{engine}] refresh stream {stream} {function}: {orders} orders in {elapsed: .4f} seconds", flush=True
+            )
+
+        store.record(
+            run_id, run_queries(connection, queries, engine=engine, mode="refresh", first_iteration=stream, **limits)
+        )
+    return results
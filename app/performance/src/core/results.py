@@ -0,0 +1,190 @@
+"""Stores query execution results in a DuckDB database so runs can be compared across engines and over time."""
+
+import uuid
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+import pyarrow as pa
+
+from performance.src.utilities.duckdb import DuckDBConnection
+
+DEFAULT_RESULTS_DATABASE = ".results/results.db"
+
+
+class ResultsStore:
+    """Appends the output of `run_queries` to the `query_runs` table of a DuckDB database.
+    Example usage:
+    ```python
+    store = ResultsStore()
+    run_id = store.new_run_id()
+    store.record(run_id, results)
+    print(store.compare(run_id))
+    ```
+    """
+
+    def __init__(self, database: Union[str, Path] = DEFAULT_RESULTS_DATABASE):
+        """Initializes the store and creates the results database if it doesn't exist."""
+        self.database = Path(database)
+        self.database.parent.mkdir(parents=True, exist_ok=True)
+        with DuckDBConnection(database=self.database) as duckdb:
+            duckdb.execute_multiple_queries(
+                [
+                    """CREATE TABLE IF NOT EXISTS query_runs (
+                        run_id VARCHAR,
+                        engine VARCHAR,
+                        query_id VARCHAR,
+                        iteration INTEGER,
+                        started_at TIMESTAMPTZ,
+                        elapsed_s DOUBLE,
+                        rows BIGINT,
+                        status VARCHAR,
+                        error VARCHAR,
+                        mode VARCHAR,
+                        stream INTEGER,
+                        parameters VARCHAR
+                    );""",
+                    # Stores created before cold/warm modes and parameterized streams were recorded
+                    "ALTER TABLE query_runs ADD COLUMN IF NOT EXISTS mode VARCHAR;",
+                    "ALTER TABLE query_runs ADD COLUMN IF NOT EXISTS stream INTEGER;",
+                    "ALTER TABLE query_runs ADD COLUMN IF NOT EXISTS parameters VARCHAR;",
+                ]
+            )
+
+    @staticmethod
+    def new_run_id() -> str:
+        """Returns a new unique run id."""
+        return uuid.uuid4().hex[:12]
+
+    def record(self, run_id: str, results: List[Dict]) -> None:
+        """Appends query results to the store under the given run id."""
+        if not results:
+            return
+        with DuckDBConnection(database=self.database) as duckdb:
+            records = pa.Table.from_pylist([{"run_id": run_id, **result} for result in results])  # noqa: F841
+            duckdb.conn.execute("INSERT INTO query_runs BY NAME SELECT * FROM records")
+
+    @staticmethod
+    def _fetch_dicts(duckdb: DuckDBConnection, query: str, parameters: List) -> List[Dict]:
+        """Runs a query on the store and returns the rows as dicts."""
+        cursor = duckdb.conn.execute(query, parameters)
+        names = [column[0] for column in cursor.description]
+        return [dict(zip(names, row)) for row in cursor.fetchall()]
+
+    def compare(self, run_id: str, engines: Optional[List[str]] = None) -> List[Dict]:
+        """Returns one row per query with the median elapsed seconds and status of every engine side by side."""
+        with DuckDBConnection(database=self.database) as duckdb:
+            engines = engines or [
+                engine
+                for (engine,) in duckdb.conn.execute(
+                    "SELECT DISTINCT engine FROM query_runs WHERE run_id = ? ORDER BY engine", [run_id]
+                ).fetchall()
+            ]
+            columns = ", ".join(
+                f"""median(elapsed_s) FILTER (WHERE engine = '{engine}' AND status = 'ok') AS "{engine}_median_s",
+                    string_agg(DISTINCT status, ',') FILTER (WHERE engine = '{engine}') AS "{engine}_status\""""
+                for engine in engines
+            )
+            return ResultsStore._fetch_dicts(
+                duckdb,
+                f"""SELECT query_id, {columns}
+                    FROM query_runs
+                    WHERE run_id = ?
+                    GROUP BY query_id
+                    ORDER BY TRY_CAST(query_id AS INTEGER) NULLS LAST, query_id""",
+                [run_id],
+            )
+
+    def compare_modes(self, run_id: str) -> List[Dict]:
+        """Returns one row per query and engine with the cold and warm median and standard deviation side by side."""
+        with DuckDBConnection(database=self.database) as duckdb:
+            return ResultsStore._fetch_dicts(
+                duckdb,
+                """SELECT
+                        query_id,
+                        engine,
+                        median(elapsed_s) FILTER (WHERE mode = 'cold') AS cold_median_s,
+                        stddev_samp(elapsed_s) FILTER (WHERE mode = 'cold') AS cold_stddev_s,
+                        median(elapsed_s) FILTER (WHERE mode = 'warm') AS warm_median_s,
+                        stddev_samp(elapsed_s) FILTER (WHERE mode = 'warm') AS warm_stddev_s,
+                        cold_median_s / nullif(warm_median_s, 0) AS cold_warm_ratio
+                    FROM query_runs
+                    WHERE run_id = ? AND status = 'ok'
+                    GROUP BY query_id, engine
+                    ORDER BY TRY_CAST(query_id AS INTEGER) NULLS LAST, query_id, engine""",
+                [run_id],
+            )
+
+    def drift(self, run_id: str, mode: str = "refresh") -> List[Dict]:
+        """Returns one row per query and engine with the elapsed seconds of the first and the last iteration,
+        their ratio and the slope of the elapsed seconds over the iterations (e.g. applied refresh streams).
+        """
+        with DuckDBConnection(database=self.database) as duckdb:
+            return ResultsStore._fetch_dicts(
+                duckdb,
+                """SELECT
+                        query_id,
+                        engine,
+                        max(iteration) AS iterations,
+                        arg_min(elapsed_s, iteration) AS first_s,
+                        arg_max(elapsed_s, iteration) AS last_s,
+                        last_s / nullif(first_s, 0) AS drift_ratio,
+                        regr_slope(elapsed_s, iteration) AS drift_s_per_iteration
+                    FROM query_runs
+                    WHERE run_id = ? AND mode = ? AND status = 'ok'
+                    GROUP BY query_id, engine
+                    ORDER BY TRY_CAST(query_id AS INTEGER) NULLS LAST, query_id, engine""",
+                [run_id, mode],
+            )
+
+    def variant_spread(self, run_id: str) -> List[Dict]:
+        """Returns one row per template, engine and mode with the spread of the median elapsed seconds over the
+        parameter sets (variants) of a parameterized run, from the fastest to the slowest variant.
+        """
+        with DuckDBConnection(database=self.database) as duckdb:
+            return ResultsStore._fetch_dicts(
+                duckdb,
+                """WITH variants AS (
+                        SELECT query_id, engine, mode, stream, parameters, median(elapsed_s) AS median_s
+                        FROM query_runs
+                        WHERE run_id = ? AND mode IN ('adhoc', 'prepared') AND status = 'ok'
+                        GROUP BY query_id, engine, mode, stream, parameters
+                    )
+                    SELECT
+                        query_id,
+                        engine,
+                        mode,
+                        count(*) AS variants,
+                        min(median_s) AS fastest_s,
+                        median(median_s) AS median_s,
+                        max(median_s) AS slowest_s,
+                        slowest_s / nullif(fastest_s, 0) AS spread_ratio,
+                        stddev_samp(median_s) / nullif(avg(median_s), 0) AS variation
+                    FROM variants
+                    GROUP BY query_id, engine, mode
+                    ORDER BY TRY_CAST(query_id AS INTEGER) NULLS LAST, query_id, engine, mode""",
+                [run_id],
+            )
+
+    def prepared_overhead(self, run_id: str) -> List[Dict]:
+        """Returns one row per template and engine with the planning time of a variant, the one time cost of
+        preparing the statement and the time saved per execution by running it prepared instead of ad hoc.
+        """
+        with DuckDBConnection(database=self.database) as duckdb:
+            return ResultsStore._fetch_dicts(
+                duckdb,
+                """SELECT
+                        query_id,
+                        engine,
+                        median(elapsed_s) FILTER (WHERE mode = 'plan') AS plan_s,
+                        median(elapsed_s) FILTER (WHERE mode = 'prepare') AS prepare_s,
+                        median(elapsed_s) FILTER (WHERE mode = 'adhoc') AS adhoc_median_s,
+                        median(elapsed_s) FILTER (WHERE mode = 'prepared') AS prepared_median_s,
+                        adhoc_median_s - prepared_median_s AS saved_s,
+                        saved_s / nullif(adhoc_median_s, 0) AS saved_ratio,
+                        CASE WHEN saved_s > 0 THEN ceil(prepare_s / saved_s) END AS break_even_executions
+                    FROM query_runs
+                    WHERE run_id = ? AND status = 'ok'
+                    GROUP BY query_id, engine
+                    ORDER BY TRY_CAST(query_id AS INTEGER) NULLS LAST, query_id, engine""",
+                [run_id],
+            )
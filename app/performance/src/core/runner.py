@@ -0,0 +1,178 @@
+"""Runs a query suite against a database connection and records the timing of every execution.
+
+Queries can be guarded by a wall clock timeout and a memory ceiling. Guarded queries run on a helper thread
+while the caller polls the elapsed time and the RSS of the process, a query that exceeds a limit is cancelled
+with the `interrupt` method of the connection wrapper and recorded with its partial elapsed time.
+A query that keeps running after being interrupted is recorded as `abandoned` and left to its (daemon) thread,
+the wrapper opens a new connection with `reopen` and the run goes on with the next execution.
+Wrappers that support it also get the limits pushed to the engine (`set_statement_timeout`, `set_memory_limit`).
+"""
+
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from performance.src.utilities.tracing import read_proc_stat, span
+
+# Seconds between two checks of the limits of a running query
+POLL_INTERVAL = 0.1
+
+# Seconds an interrupted query gets to stop before it is abandoned
+INTERRUPT_GRACE_PERIOD = 30
+
+# Status of a query that didn't stop after being interrupted
+ABANDONED = "abandoned"
+
+# Errors of the engines when they cancel a query that exceeded the statement timeout set for the session,
+# Postgres (QueryCanceled) and Snowflake (000630)
+STATEMENT_TIMEOUT_ERRORS = (
+    "canceling statement due to statement timeout",
+    "reached its statement or warehouse timeout",
+)
+
+
+def classify_error(error: Exception) -> str:
+    """Maps an engine error to the status recorded for the query.
+    Only the engines' statement timeouts count as `timeout`, other timeouts (e.g. of a connection) are errors.
+    """
+    message = f"{type(error).__name__} {error}".lower()
+    if "out of memory" in message or "outofmemory" in message:
+        return "memory_limit"
+    if any(timeout in message for timeout in STATEMENT_TIMEOUT_ERRORS):
+        return "timeout"
+    return "error"
+
+
+def _submit(func, *args) -> Future:
+    """Calls a function on a new daemon thread, so a query that can't be stopped doesn't keep the process alive."""
+    future = Future()
+
+    def run():
+        try:
+            future.set_result(func(*args))
+        except BaseException as e:
+            future.set_exception(e)
+
+    threading.Thread(target=run, name="query", daemon=True).start()
+    return future
+
+
+def _apply_limits(connection, timeout: Optional[float], memory_limit_mb: Optional[int]) -> None:
+    """Pushes the limits to the engine for the wrappers that support it."""
+    if timeout and hasattr(connection, "set_statement_timeout"):
+        connection.set_statement_timeout(timeout)
+    if memory_limit_mb and hasattr(connection, "set_memory_limit"):
+        connection.set_memory_limit(memory_limit_mb)
+
+
+def _limit_exceeded(
+    started: float, baseline_rss: int, timeout: Optional[float], memory_limit_mb: Optional[int]
+) -> Optional[str]:
+    """Returns the status of the limit a running query exceeded, None if it is within its limits."""
+    if timeout and time.perf_counter() - started > timeout:
+        return "timeout"
+    if memory_limit_mb and read_proc_stat()[1] - baseline_rss > memory_limit_mb * 1024**2:
+        return "memory_limit"
+    return None
+
+
+def execute_guarded(
+    connection, query: str, timeout: Optional[float] = None, memory_limit_mb: Optional[int] = None
+) -> Tuple[Optional[int], str, Optional[str]]:
+    """Executes a query and interrupts it once it exceeds its limits. Returns (rows, status, error).
+    A query that is still running `INTERRUPT_GRACE_PERIOD` seconds after the interrupt is returned as `abandoned`,
+    its connection can't be used anymore.
+    """
+    baseline_rss = read_proc_stat()[1]
+    started = time.perf_counter()
+    future = _submit(connection.execute_query, query)
+    status, interrupted_at = None, None
+    while True:
+        try:
+            rows = future.result(timeout=POLL_INTERVAL)
+        except FutureTimeoutError:
+            if status is None:
+                status = _limit_exceeded(started, baseline_rss, timeout, memory_limit_mb)
+                if status:
+                    connection.interrupt()
+                    interrupted_at = time.perf_counter()
+            elif time.perf_counter() - interrupted_at > INTERRUPT_GRACE_PERIOD:
+                error = f"{status}, query did not stop within {INTERRUPT_GRACE_PERIOD} seconds of the interrupt"
+                return None, ABANDONED, error
+            continue
+        except Exception as e:
+            return None, status or classify_error(e), str(e)
+
+        if status:
+            return len(rows), status, "query completed while it was being interrupted"
+        return len(rows), "ok", None
+
+
+def run_queries(
+    connection,
+    queries: Dict[str, str],
+    iterations: int = 1,
+    engine: str = "duckdb",
+    timeout: Optional[float] = None,
+    memory_limit_mb: Optional[int] = None,
+    mode: str = "warm",
+    warmup: int = 0,
+    first_iteration: int = 0,
+) -> List[Dict]:
+    """Executes every query `iterations` times on an open connection wrapper that exposes `execute_query`.
+    Failing, timed out and memory limited queries are recorded with their status and do not stop the run, after an
+    abandoned query the wrapper's `reopen` replaces the connection and the limits are applied to the new one.
+    `warmup` extra executions per query run first and are not recorded, `mode` labels the recorded executions.
+    `first_iteration` numbers the recorded executions when a caller spreads the iterations over multiple calls.
+    """
+    guarded = bool(timeout or memory_limit_mb)
+    _apply_limits(connection, timeout, memory_limit_mb)
+
+    results = []
+    with span("run_queries", engine=engine, queries=len(queries), iterations=iterations):
+        for query_id, query in queries.items():
+            for iteration in range(first_iteration - warmup, first_iteration + iterations):
+                with span("query", engine=engine, query_id=query_id, iteration=iteration, mode=mode) as attrs:
+                    started_at = datetime.now(timezone.utc)
+                    start = time.perf_counter()
+                    if guarded:
+                        rows, status, error = execute_guarded(connection, query, timeout, memory_limit_mb)
+                    else:
+                        try:
+                            rows = len(connection.execute_query(query))
+                            status, error = "ok", None
+                        except Exception as e:
+                            rows, status, error = None, classify_error(e), str(e)
+                    elapsed = time.perf_counter() - start
+                    attrs.update(status=status, rows=rows)
+
+                if status == ABANDONED:
+                    if not hasattr(connection, "reopen"):
+                        raise RuntimeError(
+                            f"Query {query_id} could not be stopped and the connection can't be reopened"
+                        )
+                    connection.reopen()
+                    _apply_limits(connection, timeout, memory_limit_mb)
+
+                if iteration < first_iteration:
+                    continue
+                results.append(
+                    {
+                        "engine": engine,
+                        "query_id": query_id,
+                        "iteration": iteration,
+                        "started_at": started_at,
+                        "elapsed_s": elapsed,
+                        "rows": rows,
+                        "status": status,
+                        "error": error,
+                        "mode": mode,
+                    }
+                )
+                print(
+                    f"[{engine}] {mode} query {query_id} iteration {iteration}: {status} in {elapsed: .4f} seconds",
+                    flush=True,
+                )
+    return results
@@ -0,0 +1,212 @@
+"""Parameterized query streams that run query templates with substitution parameters drawn from the data.
+
+A template is a DuckDB dialect query with Jinja placeholders, e.g. `d_year = {{ year }}`. The candidate values of
+a parameter come from the benchmark tables through the query of its domain in `<template_path>/parameters.json`,
+numbered parameters (`state_1`, `state_2`, ...) share the domain `state` and get distinct values. Every stream
+draws its parameter sets with its own seed, so a stream is reproducible while different streams and variants hit
+different cardinalities instead of one cached result.
+Each parameter set (variant) can run:
+- `adhoc`: the query with the values inlined as literals, parsed and planned on every execution;
+- `prepared`: `EXECUTE` of a statement that was prepared once per template with `PREPARE ... AS` and `$n` markers.
+The time to plan every variant (`EXPLAIN`) and to prepare every template is recorded as modes `plan` and
+`prepare`, so the overhead saved by preparing can be compared with the cost of planning.
+"""
+
+import json
+import random
+import time
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from pathlib import Path
+from typing import Any, Dict, List, Union
+
+from jinja2 import Environment, StrictUndefined, meta
+import sqlglot
+from sqlglot import exp
+
+from performance.src.core.queries import load_queries
+from performance.src.core.runner import run_queries
+from performance.src.core.translation import ENGINE_DIALECTS, SOURCE_DIALECT, translate_query
+from performance.src.enums import DBType
+from performance.src.utilities.tracing import span
+
+PARAMETERS_FILE = "parameters.json"
+
+_environment = Environment(undefined=StrictUndefined)
+
+
+def load_parameter_domains(template_path: Union[str, Path]) -> Dict[str, str]:
+    """Returns the query that selects the candidate values of every parameter domain as {domain: sql}."""
+    with open(Path(template_path, PARAMETERS_FILE)) as fp:
+        return json.load(fp)
+
+
+def template_parameters(template: str) -> List[str]:
+    """Returns the sorted names of the parameters used in a template."""
+    return sorted(meta.find_undeclared_variables(_environment.parse(template)))
+
+
+def parameter_domain(name: str) -> str:
+    """Returns the domain of a parameter, numbered parameters like `state_2` share the domain `state`."""
+    domain, _, number = name.rpartition("_")
+    return domain if domain and number.isdigit() else name
+
+
+def sql_literal(value: Any) -> str:
+    """Returns a parameter value as a SQL literal."""
+    if value is None:
+        return "NULL"
+    if isinstance(value, bool):
+        return "TRUE" if value else "FALSE"
+    if isinstance(value, (int, float, Decimal)):
+        return str(value)
+    if isinstance(value, datetime):
+        return f"TIMESTAMP '{value.isoformat(sep=' ')}'"
+    if isinstance(value, date):
+        return f"DATE '{value.isoformat()}'"
+    return "'{}'".format(str(value).replace("'", "''"))
+
+
+def render(template: str, values: Dict[str, str]) -> str:
+    """Substitutes the placeholders of a template with already formatted SQL, failing on missing parameters."""
+    return _environment.from_string(template).render(**values).strip().rstrip(";").strip()
+
+
+def translate_prepared(query: str, engine: DBType) -> str:
+    """Translates a query with `$n` markers to the dialect of an engine, keeping the markers for `PREPARE`.
+    sqlglot would turn them into driver placeholders like `%(1)s`, so they are replaced by verbatim SQL first.
+    """
+    if engine == DBType.DUCKDB:
+        return query
+    expression = sqlglot.parse_one(query, read=SOURCE_DIALECT).transform(
+        lambda node: exp.Var(this=f"${node.name}") if isinstance(node, exp.Placeholder) else node
+    )
+    return expression.sql(dialect=ENGINE_DIALECTS[engine], pretty=True, unsupported_level=sqlglot.ErrorLevel.RAISE)
+
+
+def load_candidates(
+    connection, domains: Dict[str, str], names: List[str], engine: DBType, cache_dir: Union[str, Path]
+) -> Dict[str, List]:
+    """Selects the candidate values of the domains of the given parameters from the benchmark tables."""
+    candidates = {}
+    for domain in sorted({parameter_domain(name) for name in names}):
+        if domain not in domains:
+            raise ValueError(f"Parameter domain {domain} is not defined in {PARAMETERS_FILE}")
+        rows = connection.execute_query(translate_query(domains[domain], engine, cache_dir))
+        # Sorted, so the values drawn for a seed don't depend on the order the engine returns them in
+        candidates[domain] = sorted(row[0] for row in rows if row[0] is not None)
+        if not candidates[domain]:
+            raise ValueError(f"Parameter domain {domain} has no values in the benchmark tables")
+    return candidates
+
+
+def draw_parameters(names: List[str], candidates: Dict[str, List], rng: random.Random) -> Dict[str, Any]:
+    """Draws one value per parameter, parameters of the same domain get distinct values while there are enough."""
+    groups = {}
+    for name in names:
+        groups.setdefault(parameter_domain(name), []).append(name)
+
+    values = {}
+    for domain, group in groups.items():
+        pool = candidates[domain]
+        drawn = rng.sample(pool, len(group)) if len(group) <= len(pool) else [rng.choice(pool) for _ in group]
+        values.update(zip(group, drawn))
+    return values
+
+
+def _prepare_statement(connection, name: str, query: str, engine: str, query_id: str) -> Dict:
+    """Prepares a statement on the connection and returns the timing as a result of mode `prepare`."""
+    with span("prepare", engine=engine, query_id=query_id) as attrs:
+        started_at = datetime.now(timezone.utc)
+        start = time.perf_counter()
+        try:
+            connection.execute_multiple_queries([f"PREPARE {name} AS {query}"])
+            status, error = "ok", None
+        except Exception as e:
+            status, error = "error", str(e)
+        elapsed = time.perf_counter() - start
+        attrs["status"] = status
+    return {
+        "engine": engine,
+        "query_id": query_id,
+        "iteration": 0,
+        "started_at": started_at,
+        "elapsed_s": elapsed,
+        "rows": None,
+        "status": status,
+        "error": error,
+        "mode": "prepare",
+        "stream": None,
+        "parameters": None,
+    }
+
+
+def run_template_streams(
+    connection,
+    template_path: Union[str, Path],
+    engine: DBType = DBType.DUCKDB,
+    streams: int = 1,
+    variants: int = 5,
+    seed: int = 0,
+    method: str = "both",
+    iterations: int = 3,
+    warmup: int = 1,
+    cache_dir: Union[str, Path] = ".cache/translated_queries",
+    **limits,
+) -> List[Dict]:
+    """Runs `variants` parameter sets of every template in each of `streams` streams on an open connection.
+    `method` is `adhoc`, `prepared` or `both`, with both every variant runs ad hoc and then prepared with the same
+    values. Results carry the stream and the JSON encoded parameter values of their variant.
+    """
+    templates = load_queries(template_path)
+    domains = load_parameter_domains(template_path)
+    names = {query_id: template_parameters(template) for query_id, template in templates.items()}
+    candidates = load_candidates(connection, domains, sorted(set().union(*names.values())), engine, cache_dir)
+
+    results = []
+    with span("run_template_streams", engine=engine.value, templates=len(templates), streams=streams) as attrs:
+        for query_id, template in templates.items():
+            statement = f"template_{query_id}"
+            prepared = method in ("prepared", "both")
+            if prepared:
+                markers = {name: f"${position}" for position, name in enumerate(names[query_id], start=1)}
+                result = _prepare_statement(
+                    connection, statement, translate_prepared(render(template, markers), engine), engine.value, query_id
+                )
+                results.append(result)
+                if result["status"] != "ok":
+                    print(f"[{engine.value}] template {query_id} could not be prepared: {result['error']}", flush=True)
+                    prepared = False
+
+            for stream in range(streams):
+                # Seeded per stream and template, so a stream draws the same values when templates are added
+                rng = random.Random(f"{seed}:{stream}:{query_id}")
+                for _ in range(variants):
+                    values = draw_parameters(names[query_id], candidates, rng)
+                    literals = {name: sql_literal(value) for name, value in values.items()}
+                    query = translate_query(render(template, literals), engine, cache_dir)
+                    runs = {"plan": f"EXPLAIN {query}"}
+                    if method in ("adhoc", "both"):
+                        runs["adhoc"] = query
+                    if prepared:
+                        runs["prepared"] = (
+                            f"EXECUTE {statement}({', '.join(literals[name] for name in names[query_id])})"
+                        )
+
+                    variant = {"stream": stream, "parameters": json.dumps(values, default=str, sort_keys=True)}
+                    for mode, sql in runs.items():
+                        for result in run_queries(
+                            connection,
+                            {query_id: sql},
+                            iterations=iterations,
+                            engine=engine.value,
+                            mode=mode,
+                            warmup=warmup,
+                            **limits,
+                        ):
+                            results.append({**result, **variant})
+
+            if prepared:
+                connection.execute_multiple_queries([f"DEALLOCATE {statement}"])
+        attrs["executions"] = len(results)
+    return results
@@ -0,0 +1,152 @@
+"""Translates DuckDB dialect query suites to the dialects of the other supported engines.
+
+Translations are cached by content hash under `cache_dir/<engine>/<sha256>.sql`, so every query of a suite is
+translated at most once per engine and sqlglot version. Queries that are known not to work on an engine are
+listed by hand, one query id per line with an optional `# reason`, in `<sql_path>/exclusions/<engine>.txt`.
+Queries that sqlglot fails to translate are skipped and reported on every run, so they run again as soon as a
+sqlglot version that supports them is installed.
+"""
+
+import hashlib
+from decimal import Decimal
+from pathlib import Path
+from typing import Dict, List, Tuple, Union
+
+from duckdb import Error as DuckDBError
+import sqlglot
+
+from performance.src.core.queries import load_queries
+from performance.src.enums import DBType
+from performance.src.utilities.duckdb import DuckDBConnection
+from performance.src.utilities.tracing import span
+
+SOURCE_DIALECT = "duckdb"
+
+# sqlglot dialect name for every supported engine
+ENGINE_DIALECTS = {
+    DBType.DUCKDB: "duckdb",
+    DBType.POSTGRESQL: "postgres",
+    DBType.SNOWFLAKE: "snowflake",
+    DBType.DATABRICKS: "databricks",
+    DBType.BIGQUERY: "bigquery",
+}
+
+
+def exclusion_file(sql_path: Union[str, Path], engine: DBType) -> Path:
+    """Returns the path of the exclusion list of an engine for a query suite."""
+    return Path(sql_path, "exclusions", f"{engine.value}.txt")
+
+
+def load_exclusions(sql_path: Union[str, Path], engine: DBType) -> Dict[str, str]:
+    """Returns the excluded queries of an engine as {query_id: reason}."""
+    path = exclusion_file(sql_path, engine)
+    if not path.exists():
+        return {}
+
+    exclusions = {}
+    for line in path.read_text().splitlines():
+        query_id, _, reason = line.partition("#")
+        if query_id.strip():
+            exclusions[query_id.strip()] = reason.strip()
+    return exclusions
+
+
+def add_exclusions(sql_path: Union[str, Path], engine: DBType, exclusions: Dict[str, str]) -> None:
+    """Appends queries to the exclusion list of an engine, queries that are already excluded are skipped."""
+    new = {
+        query_id: reason for query_id, reason in exclusions.items() if query_id not in load_exclusions(sql_path, engine)
+    }
+    if not new:
+        return
+
+    path = exclusion_file(sql_path, engine)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "a") as fp:
+        for query_id, reason in new.items():
+            # Keep the list one line per query, sqlglot errors span several lines
+            fp.write(f"{query_id}  # {' '.join(reason.split())}\n")
+
+
+def translate_query(query: str, engine: DBType, cache_dir: Union[str, Path]) -> str:
+    """Translates a single DuckDB query to the dialect of an engine, reusing the cached translation if present."""
+    if engine == DBType.DUCKDB:
+        return query
+
+    dialect = ENGINE_DIALECTS[engine]
+    digest = hashlib.sha256(f"{sqlglot.__version__}\0{dialect}\0{query}".encode()).hexdigest()
+    cached = Path(cache_dir, engine.value, f"{digest}.sql")
+    if cached.exists():
+        return cached.read_text()
+
+    translated = ";\n".join(
+        sqlglot.transpile(
+            query, read=SOURCE_DIALECT, write=dialect, pretty=True, unsupported_level=sqlglot.ErrorLevel.RAISE
+        )
+    )
+    cached.parent.mkdir(parents=True, exist_ok=True)
+    cached.write_text(translated)
+    return translated
+
+
+def translate_suite(
+    sql_path: Union[str, Path], engine: DBType, cache_dir: Union[str, Path] = ".cache/translated_queries"
+) -> Tuple[Dict[str, str], Dict[str, str]]:
+    """Translates every query of a suite to the dialect of an engine.
+    Returns the runnable queries as {query_id: sql} and the skipped ones as {query_id: reason}.
+    Queries that fail to translate are skipped and reported, but not added to the exclusion list of the engine.
+    """
+    excluded = load_exclusions(sql_path, engine)
+    queries, failed = {}, {}
+    with span("translate_suite", engine=engine.value, sql_path=str(sql_path)) as attrs:
+        for query_id, query in load_queries(sql_path).items():
+            if query_id in excluded:
+                continue
+            try:
+                queries[query_id] = translate_query(query, engine, cache_dir)
+            except sqlglot.errors.SqlglotError as e:
+                failed[query_id] = f"translation failed: {e}"
+        attrs.update(translated=len(queries), excluded=len(excluded), failed=len(failed))
+
+    for query_id, reason in failed.items():
+        print(f"[{engine.value}] skipping query {query_id}, {' '.join(reason.split())}", flush=True)
+    return queries, {**excluded, **failed}
+
+
+def _normalise(rows: List[Tuple]) -> List[Tuple]:
+    """Makes result rows comparable across dialects by rounding numbers and ignoring the row order."""
+    normalised = [
+        tuple(round(float(value), 4) if isinstance(value, (float, Decimal)) else value for value in row) for row in rows
+    ]
+    return sorted(normalised, key=repr)
+
+
+def verify_translation(
+    database: Union[str, Path],
+    sql_path: Union[str, Path],
+    engine: DBType = DBType.POSTGRESQL,
+    cache_dir: Union[str, Path] = ".cache/translated_queries",
+) -> Dict[str, str]:
+    """Checks translations offline by running the original and the translated query on the same (small scale
+    factor) DuckDB database and comparing the results. Only works for dialects DuckDB can parse, like Postgres.
+    Returns {query_id: problem} for every query that failed to translate or to run, or whose translated output
+    differs from the original. Queries on the exclusion list of the engine are not checked.
+    """
+    translated, skipped = translate_suite(sql_path, engine, cache_dir=cache_dir)
+    excluded = load_exclusions(sql_path, engine)
+    problems = {query_id: reason for query_id, reason in skipped.items() if query_id not in excluded}
+    original = load_queries(sql_path)
+    with DuckDBConnection(database=database) as duckdb, span("verify_translation", engine=engine.value):
+        for query_id, query in translated.items():
+            try:
+                expected = _normalise(duckdb.execute_query(original[query_id]))
+            except DuckDBError as e:
+                problems[query_id] = f"original query failed: {e}"
+                continue
+            try:
+                actual = _normalise(duckdb.execute_query(query))
+            except DuckDBError as e:
+                problems[query_id] = f"translated query failed: {e}"
+                continue
+            if actual != expected:
+                problems[query_id] = f"result mismatch: {len(actual)} rows instead of {len(expected)}"
+    return problems
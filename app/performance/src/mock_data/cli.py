@@ -1,40 +1,114 @@
 """CLI for that generates mock data"""
 
 import typer
-from typing import Literal
+from typing import List, Literal, Optional
 from performance.src.utilities.common import timer
 
 app = typer.Typer(help="Generate fake employee data")
 
 
-@timer
+def plan_or_check_space(generator: str, plan: bool, check_space: bool, **kwargs) -> bool:
+    """Prints the plan of a generation request when `plan` is set and refuses requests that don't fit on disk.
+    Returns True when the generation should not start.
+    """
+    if not plan and not check_space:
+        return False
+    from performance.src.mock_data.planner import format_plan, plan_generation
+
+    generation_plan = plan_generation(generator, **kwargs)
+    if plan:
+        print(format_plan(generation_plan), flush=True)
+    if not generation_plan["fits_on_disk"]:
+        print(
+            f"Not enough free disk space for {generation_plan['output_bytes'] / 1024**3: .2f} GB of output,"
+            f"{generation_plan['temp_disk_bytes'] / 1024**3: .2f} GB of temp files and"
+            f"{generation_plan['spool_bytes'] / 1024**3: .2f} GB of spooled chunks, refusing to start",
+            flush=True,
+        )
+        raise typer.Exit(code=1)
+    return plan
+
+
 @app.command(help="Create sample employee data")
+@timer
 def employee(
     scale_factor: int = typer.Option(100000, help="Number of fake employee records to generate"),
     num_of_threads: int = typer.Option(4, help="Number of parallel threads to use for data generation"),
     export_type: Literal["parquet", "csv"] = typer.Option("csv", help="Export format for the generated data"),
     target_path: str = typer.Option("fake_employee_data", help="Path where the data has to be exported"),
+    chunk_rows: int = typer.Option(10000, help="Number of records generated and written per chunk"),
+    max_in_flight: Optional[int] = typer.Option(
+        None, help="Maximum chunks generated at the same time, defaults to twice the number of threads"
+    ),
+    pipeline: bool = typer.Option(
+        False, help="Hand the chunks to a single writer over shared memory instead of writing one file per chunk"
+    ),
+    sort_by: Optional[str] = typer.Option(None, help="Column the pipeline writer sorts the whole dataset on"),
+    target_file_mb: float = typer.Option(128, help="Size of the files written by the pipeline writer"),
+    spool_dir: Optional[str] = typer.Option(
+        None,
+        help="Directory the chunks are handed over in, defaults to /dev/shm, needs room for all chunks when sorting",
+    ),
+    plan: bool = typer.Option(False, help="Only predict size, files, memory, temp disk and time from a small sample"),
+    check_space: bool = typer.Option(True, help="Refuse to start if the predicted output doesn't fit on disk"),
 ) -> None:
     """Command to generate fake employee data"""
-    from performance.src.mock_data.employee.workday import main
+    if sort_by and not pipeline:
+        raise typer.BadParameter("Sorting the dataset requires --pipeline", param_hint="--sort-by")
+    from performance.src.mock_data.employee.employee import EMPLOYEE_SCHEMA
 
-    main(scale_factor=scale_factor, num_of_threads=num_of_threads, export_type=export_type, target_path=target_path)
+    if sort_by and sort_by not in EMPLOYEE_SCHEMA.names:
+        raise typer.BadParameter(
+            f"Unknown column '{sort_by}', expected one of {', '.join(EMPLOYEE_SCHEMA.names)}", param_hint="--sort-by"
+        )
+    options = {
+        "scale_factor": scale_factor,
+        "num_of_threads": num_of_threads,
+        "export_type": export_type,
+        "target_path": target_path,
+        "chunk_rows": chunk_rows,
+        "max_in_flight": max_in_flight,
+        "pipeline": pipeline,
+        "sort_by": sort_by,
+        "target_file_mb": target_file_mb,
+        "spool_dir": spool_dir,
+    }
+    if plan_or_check_space("employee", plan, check_space, **options):
+        return
+    from performance.src.mock_data.employee.employee import main
+
+    main(**options)
 
 
-@timer
 @app.command(help="Create sample employee data in workday data model")
+@timer
 def workday(
     export_type: Literal["parquet", "csv"] = typer.Option("csv", help="Export format for the generated data"),
     target_path: str = typer.Option("fake_workday_data", help="Path where the data has to be exported"),
+    seed_path: Optional[str] = typer.Option(
+        None, help="Directory with dbt_workday seed CSVs, defaults to the seeds vendored in sample_datasets/workday"
+    ),
+    refresh_seeds: bool = typer.Option(False, help="Clone dbt_workday and replace the seed CSVs of the seed path"),
+    amplification_factor: int = typer.Option(
+        1, help="Replicate every seed table this many times with remapped keys, written as partitioned files"
+    ),
+    partitions: int = typer.Option(16, help="Number of partitions of each amplified table"),
 ) -> None:
     """Command to generate fake employee data"""
     from performance.src.mock_data.employee.workday import main
 
-    main(export_type=export_type, target_path=target_path)
+    main(
+        export_type=export_type,
+        target_path=target_path,
+        seed_path=seed_path,
+        refresh_seeds=refresh_seeds,
+        amplification_factor=amplification_factor,
+        partitions=partitions,
+    )
 
 
+@app.command(help="Create sample TPC-H data")
 @timer
-@app.command("Create sample TPC-H data")
 def tpc_h(
     scale_factor: Literal[1, 3, 10, 30, 100, 300, 1000, 3000] = typer.Option(
         3, help="Scale factor for TPC-H data generation"
@@ -42,36 +116,94 @@ def tpc_h(
     num_of_threads: int = typer.Option(4, help="Number of parallel threads to use for data generation"),
     export_type: Literal["parquet", "csv"] = typer.Option("csv", help="Export format for the generated data"),
     target_path: str = typer.Option("tpc_h_data_", help="Path where the data has to be exported"),
-    sql_path: str = typer.Option("/sqls/tcp_h", help="Path where the TPC-H queries will be exported"),
+    sql_path: str = typer.Option("sqls/tcp_h", help="Path where the TPC-H queries will be exported"),
+    chunks: Optional[int] = typer.Option(
+        None, help="Number of dbgen steps the data is split into, defaults to four per thread"
+    ),
+    max_in_flight: Optional[int] = typer.Option(
+        None, help="Maximum steps generated at the same time, defaults to twice the number of threads"
+    ),
+    plan: bool = typer.Option(False, help="Only predict size, files, memory, temp disk and time from a small sample"),
+    check_space: bool = typer.Option(True, help="Refuse to start if the predicted output doesn't fit on disk"),
 ) -> None:
     """Command to generate TPC-H data using DuckDB's TPC-H extension"""
+    options = {
+        "scale_factor": scale_factor,
+        "num_of_threads": num_of_threads,
+        "export_type": export_type,
+        "sql_path": sql_path,
+        "target_path": target_path,
+        "chunks": chunks,
+        "max_in_flight": max_in_flight,
+    }
+    if plan_or_check_space("tpc_h", plan, check_space, **options):
+        return
     from performance.src.mock_data.tpc.tpc_h import main
 
-    main(
-        scale_factor=scale_factor,
-        num_of_threads=num_of_threads,
-        export_type=export_type,
-        sql_path=sql_path,
-        target_path=target_path,
-    )
+    main(**options)
 
 
+@app.command(help="Create TPC-H refresh function datasets (RF1 new orders and lineitems, RF2 deleted keys)")
 @timer
+def tpc_h_refresh(
+    scale_factor: float = typer.Option(1, help="Scale factor of the initial TPC-H load the refreshes apply to"),
+    refresh_streams: int = typer.Option(2, help="Number of refresh streams to create"),
+    refresh_path: str = typer.Option("tpc_h_refresh", help="Path where the Parquet refresh datasets are exported"),
+    database: Optional[str] = typer.Option(
+        None, help="DuckDB database with the initial TPC-H load, generated in memory if not given"
+    ),
+) -> None:
+    """Command to generate TPC-H refresh streams"""
+    from performance.src.mock_data.tpc.tpc_h import create_refresh_sets
+
+    create_refresh_sets(scale_factor, refresh_streams, refresh_path, database=database)
+
+
 @app.command(help="Create sample TPC-DS data")
+@timer
 def tpc_ds(
     scale_factor: Literal[1, 10, 100, 999] = typer.Option(1, help="Scale factor for TPC-DS data generation"),
     export_type: Literal["parquet", "csv"] = typer.Option("csv", help="Export format for the generated data"),
     target_path: str = typer.Option("tpc_ds_data", help="Path where the data has to be exported"),
     sql_path: str = typer.Option("sqls/tcp_ds", help="Path where the TPC-DS queries will be exported"),
     file_size: int = typer.Option(128, help="Each file size in MB"),
+    num_of_threads: int = typer.Option(4, help="Number of parallel processes that export the tables"),
+    max_in_flight: Optional[int] = typer.Option(
+        None, help="Maximum table chunks exported at the same time, defaults to twice the number of threads"
+    ),
+    sort: bool = typer.Option(False, help="Sort the fact tables on their date key to enable row group pruning"),
+    bloom_filters: bool = typer.Option(False, help="Write Parquet bloom filters on the business key columns"),
+    row_group_size: Optional[int] = typer.Option(None, help="Rows per Parquet row group"),
+    compression: Optional[str] = typer.Option(None, help="Compression codec, e.g. snappy, zstd, gzip"),
+    compression_level: Optional[int] = typer.Option(None, help="Compression level of the codec"),
+    partition_columns: Optional[List[str]] = typer.Option(
+        None, "--partition-column", help="Hive partition a table on a column, given as TABLE=COLUMN"
+    ),
+    plan: bool = typer.Option(False, help="Only predict size, files, memory, temp disk and time from a small sample"),
+    check_space: bool = typer.Option(True, help="Refuse to start if the predicted output doesn't fit on disk"),
 ) -> None:
     """Command to generate TPC-H data using DuckDB's TPC-DS extension"""
+    for option in partition_columns or []:
+        table, _, column = option.partition("=")
+        if not table.strip() or not column.strip():
+            raise typer.BadParameter(f"Expected TABLE=COLUMN, got '{option}'", param_hint="--partition-column")
+    options = {
+        "scale_factor": scale_factor,
+        "export_type": export_type,
+        "sql_path": sql_path,
+        "target_path": target_path,
+        "file_size": file_size,
+        "num_of_threads": num_of_threads,
+        "max_in_flight": max_in_flight,
+        "sort": sort,
+        "bloom_filters": bloom_filters,
+        "row_group_size": row_group_size,
+        "compression": compression,
+        "compression_level": compression_level,
+        "partition_columns": partition_columns,
+    }
+    if plan_or_check_space("tpc_ds", plan, check_space, **options):
+        return
     from performance.src.mock_data.tpc.tpc_ds import main
 
-    main(
-        scale_factor=scale_factor,
-        export_type=export_type,
-        sql_path=sql_path,
-        target_path=target_path,
-        file_size=file_size,
-    )
+    main(**options)
@@ -1,22 +1,80 @@
 """Generate mock employee data"""
 
 import random
+import shutil
 import pyarrow as pa
 import pyarrow.csv as csv
 import pyarrow.parquet as pq
 
 from faker import Faker
 from datetime import datetime
-from multiprocessing import Pool
 from pathlib import Path
+from typing import Union
 
 from performance.src.utilities import common
-
-
-def generate_fake_employees(input_args) -> None:
-    """Generates fake employee data using the Faker library and exports it to the specified format (Parquet or CSV)."""
+from performance.src.utilities.handoff import DatasetWriter, publish, spool_directory
+from performance.src.utilities.scheduler import run_chunks
+from performance.src.utilities.tracing import span
+
+# Employees generated and written per chunk
+DEFAULT_CHUNK_ROWS = 10000
+
+# Columns of the employee table, Arrow would type columns that are all null in a chunk (like the `manager_id` of
+# the first employees) as `null`, which doesn't match the other chunks
+EMPLOYEE_SCHEMA = pa.schema(
+    [
+        ("employee_id", pa.int64()),
+        ("first_name", pa.string()),
+        ("last_name", pa.string()),
+        ("manager_id", pa.int64()),
+        ("email", pa.string()),
+        ("phone_number", pa.string()),
+        ("work_location", pa.string()),
+        ("worker_type", pa.string()),
+        ("job_title", pa.string()),
+        ("department", pa.string()),
+        ("annual_summary_currency", pa.string()),
+        ("annual_summary_total_base_pay", pa.float64()),
+        ("is_hispanic_or_latino", pa.bool_()),
+        ("military_status", pa.bool_()),
+        ("city", pa.string()),
+        ("country", pa.string()),
+        ("address", pa.string()),
+        ("ssn", pa.string()),
+        ("date_of_birth", pa.string()),
+        ("start_date", pa.string()),
+        ("is_user_active", pa.bool_()),
+        ("compensation_eligible", pa.bool_()),
+        ("days_employed", pa.duration("us")),
+        ("is_employed_one_year", pa.bool_()),
+        ("is_employed_five_years", pa.bool_()),
+        ("is_employed_ten_years", pa.bool_()),
+        ("is_employed_twenty_years", pa.bool_()),
+        ("is_employed_thirty_years", pa.bool_()),
+        ("is_terminated", pa.bool_()),
+        ("is_regrettable_termination", pa.bool_()),
+        ("terminate_date", pa.string()),
+        ("compensation_effective_date", pa.string()),
+        ("employee_compensation_frequency", pa.string()),
+    ]
+)
+
+
+def generate_fake_employees(input_args) -> Union[int, str]:
+    """Generates fake employee data using the Faker library and exports it to the specified format (Parquet or CSV).
+    Each call generates one chunk of `chunk_rows` employees, with ids following the ones of the previous chunks and
+    random values seeded by the chunk number.
+    Returns the number of generated employees, in pipeline mode the chunk is handed to the writer instead and the
+    path of its Arrow IPC file is returned.
+    """
     worker, kwargs = input_args
+    chunk_rows = kwargs.get("chunk_rows") or DEFAULT_CHUNK_ROWS
+    first_id = worker * chunk_rows
+    # Every chunk has its own seed, forked workers would otherwise start from copies of the same global state and
+    # repeat each other's rows, and a chunk generates the same rows whichever worker runs it
     fake = Faker("en_US")
+    fake.seed_instance(worker)
+    rng = random.Random(worker)
     employees = []
 
     # Define possible job roles and departments
@@ -32,94 +90,130 @@ def generate_fake_employees(input_args) -> None:
     work_location = [fake.city() for _ in range(10)]
     employee_compensation_frequency = ["Monthly", "Annually"]
 
-    for cnt in range(int(kwargs.get("scale_factor") / kwargs.get("num_of_threads"))):
-        emp_id = 1000 * worker + cnt
-        first_name = fake.first_name()
-        last_name = fake.last_name()
-        # emp_id = fake.unique.random_number(digits=5)
-
-        employee_data = {
-            "employee_id": emp_id,
-            "first_name": first_name,
-            "last_name": last_name,
-            "manager_id": None if emp_id < 10 else random.randint(0, emp_id - 1),
-            "email": f"{first_name.lower()}.{last_name.lower()}@fakecompany.com",
-            "phone_number": fake.phone_number(),
-            "work_location": random.choice(work_location).strip(),
-            "worker_type": random.choice(worker_type).strip(),
-            "job_title": random.choice(job_titles).strip(),
-            "department": random.choice(departments).strip(),
-            "annual_summary_currency": "USD",
-            "annual_summary_total_base_pay": float(random.randrange(60000, 150000, 5000)),
-            "is_hispanic_or_latino": fake.boolean(chance_of_getting_true=20),
-            "military_status": fake.boolean(chance_of_getting_true=10),
-            "city": fake.city(),
-            "country": fake.country(),
-            "address": fake.address().replace("\n", ", "),
-            "ssn": fake.ssn(),
-            "date_of_birth": fake.date_of_birth(minimum_age=18, maximum_age=65).isoformat(),
-            "start_date": fake.date_between(start_date="-30y", end_date="today").isoformat(),
-            "is_user_active": fake.boolean(chance_of_getting_true=90),
-            "compensation_eligible": fake.boolean(chance_of_getting_true=95),
-        }
-        state_date_datetime = datetime.fromisoformat(employee_data["start_date"]).date()
-
-        # Calculate days employed based on whether the user is active or not
-        employee_data["days_employed"] = (
-            datetime.today().date() - state_date_datetime
-            if employee_data["is_user_active"]
-            else fake.date_between(start_date=state_date_datetime, end_date="today") - state_date_datetime
-        )
-
-        # Set employment duration flags based on days employed
-        employee_data["is_employed_one_year"] = employee_data["days_employed"].days >= 365
-        employee_data["is_employed_five_years"] = employee_data["days_employed"].days >= 365 * 5
-        employee_data["is_employed_ten_years"] = employee_data["days_employed"].days >= 365 * 10
-        employee_data["is_employed_twenty_years"] = employee_data["days_employed"].days >= 365 * 20
-        employee_data["is_employed_thirty_years"] = employee_data["days_employed"].days >= 365 * 30
-
-        # Set is_terminated based on is_user_active and randomly mark some terminations as regrettable
-        employee_data["is_terminated"] = not employee_data["is_user_active"]
-        employee_data["is_regrettable_termination"] = employee_data["is_terminated"] and fake.boolean(
-            chance_of_getting_true=30
-        )
-
-        # Set terminate_date if the employee is terminated, otherwise set it to None
-        employee_data["terminate_date"] = (
-            fake.date_between(start_date=state_date_datetime, end_date="today").isoformat()
-            if employee_data["is_terminated"]
-            else None
-        )
-
-        # Set compensation_effective_date if the employee is compensation eligible, otherwise set it to None
-        employee_data["compensation_effective_date"] = (
-            fake.date_between(start_date=state_date_datetime, end_date="today").isoformat()
-            if employee_data["compensation_eligible"]
-            else None
-        )
-
-        # Set employee_compensation_frequency if the employee is compensation eligible, otherwise set it to None
-        employee_data["employee_compensation_frequency"] = (
-            random.choice(employee_compensation_frequency) if employee_data["compensation_eligible"] else None
-        )
-        employees.append(employee_data)
-
-    pyarrow_table = pa.Table.from_pylist(employees)
-    if kwargs.get("export_type") == "csv":
-        csv.write_csv(pyarrow_table, f"{kwargs.get('target_path')}/part_{worker}.csv")
-    elif kwargs.get("export_type") == "parquet":
-        pq.write_table(pyarrow_table, f"{kwargs.get('target_path')}/part_{worker}.parquet")
+    with span("generate_rows", worker=worker) as attrs:
+        for cnt in range(min(chunk_rows, kwargs.get("scale_factor") - first_id)):
+            emp_id = first_id + cnt
+            first_name = fake.first_name()
+            last_name = fake.last_name()
+            # emp_id = fake.unique.random_number(digits=5)
+
+            employee_data = {
+                "employee_id": emp_id,
+                "first_name": first_name,
+                "last_name": last_name,
+                "manager_id": None if emp_id < 10 else rng.randint(0, emp_id - 1),
+                "email": f"{first_name.lower()}.{last_name.lower()}@fakecompany.com",
+                "phone_number": fake.phone_number(),
+                "work_location": rng.choice(work_location).strip(),
+                "worker_type": rng.choice(worker_type).strip(),
+                "job_title": rng.choice(job_titles).strip(),
+                "department": rng.choice(departments).strip(),
+                "annual_summary_currency": "USD",
+                "annual_summary_total_base_pay": float(rng.randrange(60000, 150000, 5000)),
+                "is_hispanic_or_latino": fake.boolean(chance_of_getting_true=20),
+                "military_status": fake.boolean(chance_of_getting_true=10),
+                "city": fake.city(),
+                "country": fake.country(),
+                "address": fake.address().replace("\n", ", "),
+                "ssn": fake.ssn(),
+                "date_of_birth": fake.date_of_birth(minimum_age=18, maximum_age=65).isoformat(),
+                "start_date": fake.date_between(start_date="-30y", end_date="today").isoformat(),
+                "is_user_active": fake.boolean(chance_of_getting_true=90),
+                "compensation_eligible": fake.boolean(chance_of_getting_true=95),
+            }
+            state_date_datetime = datetime.fromisoformat(employee_data["start_date"]).date()
+
+            # Calculate days employed based on whether the user is active or not
+            employee_data["days_employed"] = (
+                datetime.today().date() - state_date_datetime
+                if employee_data["is_user_active"]
+                else fake.date_between(start_date=state_date_datetime, end_date="today") - state_date_datetime
+            )
+
+            # Set employment duration flags based on days employed
+            employee_data["is_employed_one_year"] = employee_data["days_employed"].days >= 365
+            employee_data["is_employed_five_years"] = employee_data["days_employed"].days >= 365 * 5
+            employee_data["is_employed_ten_years"] = employee_data["days_employed"].days >= 365 * 10
+            employee_data["is_employed_twenty_years"] = employee_data["days_employed"].days >= 365 * 20
+            employee_data["is_employed_thirty_years"] = employee_data["days_employed"].days >= 365 * 30
+
+            # Set is_terminated based on is_user_active and randomly mark some terminations as regrettable
+            employee_data["is_terminated"] = not employee_data["is_user_active"]
+            employee_data["is_regrettable_termination"] = employee_data["is_terminated"] and fake.boolean(
+                chance_of_getting_true=30
+            )
+
+            # Set terminate_date if the employee is terminated, otherwise set it to None
+            employee_data["terminate_date"] = (
+                fake.date_between(start_date=state_date_datetime, end_date="today").isoformat()
+                if employee_data["is_terminated"]
+                else None
+            )
+
+            # Set compensation_effective_date if the employee is compensation eligible, otherwise set it to None
+            employee_data["compensation_effective_date"] = (
+                fake.date_between(start_date=state_date_datetime, end_date="today").isoformat()
+                if employee_data["compensation_eligible"]
+                else None
+            )
+
+            # Set employee_compensation_frequency if the employee is compensation eligible, otherwise set it to None
+            employee_data["employee_compensation_frequency"] = (
+                rng.choice(employee_compensation_frequency) if employee_data["compensation_eligible"] else None
+            )
+            employees.append(employee_data)
+        attrs["rows"] = len(employees)
+
+    with span("to_arrow", worker=worker):
+        pyarrow_table = pa.Table.from_pylist(employees, schema=EMPLOYEE_SCHEMA)
+
+    if kwargs.get("pipeline"):
+        return publish(pyarrow_table, kwargs.get("spool_dir"), f"chunk_{worker}")
+
+    with span("write", worker=worker, export_type=kwargs.get("export_type")):
+        if kwargs.get("export_type") == "csv":
+            csv.write_csv(pyarrow_table, f"{kwargs.get('target_path')}/part_{worker}.csv")
+        elif kwargs.get("export_type") == "parquet":
+            pq.write_table(pyarrow_table, f"{kwargs.get('target_path')}/part_{worker}.parquet")
+    return len(employees)
 
 
 def main(**kwargs) -> None:
     """Main function to generate fake employee data in parallel using multiprocessing.
-    It creates the target directory if it doesn't exist, prepares the input arguments for each worker thread,
-    and then uses a multiprocessing Pool to execute the data generation function across multiple threads.
+    It creates the target directory if it doesn't exist, splits the records into chunks of `chunk_rows` and
+    lets the scheduler run the data generation function on the chunks across `num_of_threads` processes.
+    With `pipeline` the chunks are handed to a single writer that writes files of `target_file_mb`, sorted on
+    `sort_by` if given, and a manifest, instead of one file per chunk.
     """
     Path(kwargs.get("target_path")).mkdir(parents=True, exist_ok=True)
-    input_args = [(i, kwargs) for i in range(kwargs.get("num_of_threads"))]
-    with Pool(processes=kwargs.get("num_of_threads")) as pool:
-        pool.map(generate_fake_employees, input_args)
+    chunk_rows = kwargs.get("chunk_rows") or DEFAULT_CHUNK_ROWS
+    chunks = -(-kwargs.get("scale_factor") // chunk_rows)
+    writer = None
+    if kwargs.get("pipeline"):
+        kwargs = {**kwargs, "spool_dir": spool_directory(kwargs.get("spool_dir"))}
+        writer = DatasetWriter(
+            kwargs.get("target_path"),
+            export_type=kwargs.get("export_type"),
+            target_file_bytes=int((kwargs.get("target_file_mb") or 128) * 1024**2),
+            sort_by=kwargs.get("sort_by"),
+            schema=EMPLOYEE_SCHEMA,
+        )
+    try:
+        run_chunks(
+            generate_fake_employees,
+            [(i, kwargs) for i in range(chunks)],
+            workers=kwargs.get("num_of_threads"),
+            max_in_flight=kwargs.get("max_in_flight"),
+            label="employee",
+            total_rows=kwargs.get("scale_factor"),
+            consume=writer.consume if writer else None,
+        )
+        if writer:
+            manifest = writer.close()
+            print(f"Wrote {manifest['rows']} rows to {len(manifest['files'])} files and a manifest", flush=True)
+    finally:
+        if writer:
+            shutil.rmtree(kwargs.get("spool_dir"), ignore_errors=True)
 
     print("Successfully generated fake employee data")
 
@@ -1,35 +1,110 @@
-"""Using : https://github.com/fivetran/dbt_workday/tree/main/integration_tests/seeds"""
+"""Using : https://github.com/fivetran/dbt_workday/tree/main/integration_tests/seeds
+
+The seeds are vendored in `sample_datasets/workday` (see `load_seeds`), so generating data needs no network access.
+`--refresh-seeds` clones dbt_workday again and replaces the vendored copy. The seeds are only a few hundred rows, `amplify` replicates every
+seed table N times in DuckDB and remaps all key columns per replica so joins between the tables still line up.
+"""
 
-from tempfile import TemporaryDirectory
-import git
 import shutil
-from performance.src.utilities.duckdb import DuckDBConnection
 from pathlib import Path
+from tempfile import TemporaryDirectory
+from typing import List, Optional, Union
+
+from performance.src.utilities import common
+from performance.src.utilities.duckdb import DuckDBConnection
+from performance.src.utilities.tracing import span
 
+GIT_URL = "https://github.com/fivetran/dbt_workday.git"
 
-def main(**kwargs) -> None:
-    """Main function to generate fake workday data by cloning the dbt_workday repository"""
-    # The URL of the GitHub repository
-    git_url = "https://github.com/fivetran/dbt_workday.git"
 
+# Directory of the vendored dbt_workday seeds
+SEED_PATH = Path(common.project_path(), "sample_datasets", "workday")
+
+
+def load_seeds(seed_path: Optional[Union[str, Path]] = None, refresh: bool = False) -> Path:
+    """Returns the directory with the Workday seed CSVs, the vendored seeds unless `seed_path` is given.
+    Only `refresh` clones dbt_workday, its seeds replace the CSVs of the directory.
+    """
+    seed_path = Path(seed_path) if seed_path else SEED_PATH
+    if not refresh:
+        if not any(seed_path.glob("*.csv")):
+            raise FileNotFoundError(f"No Workday seed CSVs in {seed_path}, run with --refresh-seeds to fetch them")
+        return seed_path
+
+    import git
+
+    with TemporaryDirectory() as temp_dir, span("clone_workday_seeds"):
+        git.Repo.clone_from(GIT_URL, temp_dir, depth=1)
+        print(f"Successfully cloned {GIT_URL} to {temp_dir}")
+        seed_path.mkdir(parents=True, exist_ok=True)
+        for file in seed_path.glob("*.csv"):
+            file.unlink()
+        for file in Path(temp_dir, "integration_tests", "seeds").glob("*.csv"):
+            shutil.copy(file, seed_path)
+
+    print(f"Refreshed workday seeds in {seed_path}")
+    return seed_path
+
+
+def key_columns(columns: List[str]) -> List[str]:
+    """Returns the columns that identify or reference a Workday record and have to be remapped per replica.
+    Shared lookups such as `country_id` are remapped as well, which is harmless as every table is replicated.
+    """
+    return [column for column in columns if column.lower() == "id" or column.lower().endswith("_id")]
+
+
+def amplify(seed_path: Path, target_path: Union[str, Path], factor: int, export_type: str, partitions: int) -> None:
+    """Writes every seed table `factor` times into a dataset partitioned by `replica_partition`.
+    Key columns are read as VARCHAR and replica r > 0 appends `_r` to every key, the same mapping is applied to
+    all tables so the replicas behave like independent Workday tenants that each join up on their own.
+    """
+    file_format = "PARQUET" if export_type == "parquet" else "CSV, HEADER"
+    with DuckDBConnection() as duckdb:
+        duckdb.execute_multiple_queries([f"CREATE TABLE replicas AS SELECT range AS replica FROM range({factor})"])
+        for seed in sorted(seed_path.glob("*.csv")):
+            columns = [row[0] for row in duckdb.execute_query(f"DESCRIBE SELECT * FROM read_csv_auto('{seed}')")]
+            keys = key_columns(columns)
+            types = (", types = {" + ", ".join(f"'{column}': 'VARCHAR'" for column in keys) + "}") if keys else ""
+            projection = ", ".join(
+                f"""if(replica = 0, "{column}", "{column}" || '_' || replica) AS "{column}\""""
+                if column in keys
+                else f'"{column}"'
+                for column in columns
+            )
+            with span("amplify_table", table=seed.stem, factor=factor, key_columns=len(keys)):
+                duckdb.conn.execute(
+                    f"""COPY (
+                            SELECT {projection}, replica % {partitions} AS replica_partition
+                            FROM read_csv_auto('{seed}'{types}), replicas
+                        ) TO '{Path(target_path, seed.stem)}'
+                        (FORMAT {file_format}, PARTITION_BY (replica_partition), OVERWRITE_OR_IGNORE)"""
+                )
+            print(f"Amplified {seed.stem} x{factor}, remapped keys: {', '.join(keys) or '-'}", flush=True)
+
+
+def main(**kwargs) -> None:
+    """Main function to generate fake workday data from the vendored dbt_workday seeds"""
     Path(kwargs.get("target_path")).mkdir(parents=True, exist_ok=True)
+    seed_path = load_seeds(kwargs.get("seed_path"), refresh=kwargs.get("refresh_seeds", False))
 
-    # Clone the repository
-    with TemporaryDirectory() as temp_dir:
-        git.Repo.clone_from(git_url, temp_dir)
-        print(f"Successfully cloned {git_url} to {temp_dir}")
-
-        kwargs.get("target_path")
-        if kwargs.get("export_type") == "csv":
-            for file in Path(temp_dir, "integration_tests", "seeds").glob("*.csv"):
-                shutil.copy(Path(temp_dir, "integration_tests", "seeds", file), Path(kwargs.get("target_path")))
-        elif kwargs.get("export_type") == "parquet":
-            with DuckDBConnection() as duckdb:
-                for table in Path(temp_dir, "integration_tests", "seeds").glob("*.csv"):
-                    duckdb.conn.execute(
-                        f"COPY (SELECT * FROM read_csv_auto('{table}')) "
-                        f"TO '{Path(kwargs.get('target_path'), table.stem)}.parquet' "
-                        f"(FORMAT PARQUET);"
-                    )
+    if kwargs.get("amplification_factor", 1) > 1:
+        amplify(
+            seed_path,
+            kwargs.get("target_path"),
+            factor=kwargs.get("amplification_factor"),
+            export_type=kwargs.get("export_type"),
+            partitions=kwargs.get("partitions", 16),
+        )
+    elif kwargs.get("export_type") == "csv":
+        for file in seed_path.glob("*.csv"):
+            shutil.copy(file, Path(kwargs.get("target_path")))
+    elif kwargs.get("export_type") == "parquet":
+        with DuckDBConnection() as duckdb:
+            for table in seed_path.glob("*.csv"):
+                duckdb.conn.execute(
+                    f"COPY (SELECT * FROM read_csv_auto('{table}')) "
+                    f"TO '{Path(kwargs.get('target_path'), table.stem)}.parquet' "
+                    f"(FORMAT PARQUET);"
+                )
 
     print(f"Successfully generated fake workday data in {kwargs.get('target_path')}")
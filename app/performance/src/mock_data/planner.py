@@ -0,0 +1,259 @@
+"""Dry-run planner that predicts the output size, files, memory, temp disk and wall time of a generation request.
+
+Two tiny samples of the generator are produced on the current machine, in a fresh process each, with a single
+DuckDB thread. The rows of every table are fitted linearly over the two sample scales (so fixed size tables like
+`nation` or `date_dim` stay fixed), bytes per row and the generation and export times are taken from the bigger
+sample and scaled to the requested configuration. Tables that grow sublinearly (TPC-DS dimensions) are
+overestimated, which keeps the disk space check on the safe side. For the employee pipeline the chunks spooled
+as Arrow IPC files are counted against the spool directory (shared memory by default): all of them when the
+dataset is sorted, as they stay there until the writer closes, otherwise the chunks in flight.
+"""
+
+import math
+import os
+import resource
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Tuple, Union
+
+from performance.src.mock_data.employee.employee import generate_fake_employees
+from performance.src.mock_data.tpc import tpc_ds
+from performance.src.utilities.duckdb import DuckDBConnection
+from performance.src.utilities.handoff import DatasetWriter, spool_parent
+from performance.src.utilities.tracing import read_proc_stat, span
+
+# Scales of the two samples per generator: scale factors for TPC, records for employee
+SAMPLE_SCALES = {"tpc_h": (0.01, 0.02), "tpc_ds": (0.01, 0.02), "employee": (500, 1000)}
+
+# Share of the free space that may be used, the rest is headroom for the estimation error
+DISK_HEADROOM = 0.9
+
+# Share of the physical memory DuckDB uses before it spills to disk (its default memory_limit)
+DUCKDB_MEMORY_SHARE = 0.8
+
+# Directory the TPC-DS generator keeps its temporary database in
+TEMP_PATH = ".tmp"
+
+
+def _directory_bytes(path: Union[str, Path]) -> int:
+    """Returns the total size of the files below a directory."""
+    return sum(file.stat().st_size for file in Path(path).rglob("*") if file.is_file())
+
+
+def _sample_tpc(generator: str, scale: float, work_dir: Path, options: Dict) -> Tuple[Dict, int, float]:
+    """Generates a TPC sample into a database file and exports it with the layout options of the request.
+    Returns (tables, temp bytes, generate seconds).
+    """
+    extension, call = ("tpch", f"dbgen(sf = {scale})") if generator == "tpc_h" else ("tpcds", f"dsdgen(sf = {scale})")
+    tables = {}
+    with DuckDBConnection(database=Path(work_dir, "sample.db")) as duckdb:
+        duckdb.execute_multiple_queries(["SET threads = 1;", f"INSTALL {extension};", f"LOAD {extension};"])
+        start = time.perf_counter()
+        duckdb.execute_multiple_queries([f"CALL {call};", "CHECKPOINT;"])
+        generate_s = time.perf_counter() - start
+        for (table,) in duckdb.execute_query("SHOW TABLES;"):
+            start = time.perf_counter()
+            duckdb.export_table(
+                table,
+                export_type=options.get("export_type", "csv"),
+                target_path=Path(work_dir, "export"),
+                **(tpc_ds.layout_kwargs(table, **options) if generator == "tpc_ds" else {}),
+            )
+            tables[table] = {
+                "rows": duckdb.execute_query(f"SELECT count(*) FROM {table}")[0][0],
+                "bytes": _directory_bytes(Path(work_dir, "export", table)),
+                "export_s": time.perf_counter() - start,
+            }
+    return tables, Path(work_dir, "sample.db").stat().st_size, generate_s
+
+
+def _sample_employee(scale: int, work_dir: Path, options: Dict) -> Tuple[Dict, int, float]:
+    """Generates an employee sample as one chunk, through the spool and the dataset writer for the pipeline.
+    Returns (tables, temp bytes, generate seconds), the temp bytes are the spooled Arrow IPC file of the pipeline.
+    """
+    export_type = options.get("export_type", "csv")
+    kwargs = {"scale_factor": scale, "chunk_rows": scale, "export_type": export_type, "target_path": work_dir}
+    start = time.perf_counter()
+    if options.get("pipeline"):
+        path = generate_fake_employees((0, {**kwargs, "pipeline": True, "spool_dir": work_dir}))
+        temp_bytes = Path(path).stat().st_size
+        writer = DatasetWriter(Path(work_dir, "export"), export_type)
+        writer.consume(path)
+        manifest = writer.close()
+        rows, output_bytes = manifest["rows"], manifest["bytes"]
+    else:
+        rows, temp_bytes = generate_fake_employees((0, kwargs)), 0
+        output_bytes = _directory_bytes(work_dir)
+    # Generation and write are measured together, the write is a small share of it
+    tables = {"employee": {"rows": rows, "bytes": output_bytes, "export_s": 0.0}}
+    return tables, temp_bytes, time.perf_counter() - start
+
+
+def measure_sample(generator: str, scale: float, options: Dict) -> Dict:
+    """Generates one sample in the current process and returns its tables, temp bytes, times and memory growth."""
+    baseline_rss = read_proc_stat()[1]
+    with tempfile.TemporaryDirectory(prefix="plan_") as work_dir:
+        if generator == "employee":
+            tables, temp_bytes, generate_s = _sample_employee(int(scale), Path(work_dir), options)
+        else:
+            tables, temp_bytes, generate_s = _sample_tpc(generator, scale, Path(work_dir), options)
+    # ru_maxrss is in kilobytes on Linux
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    return {
+        "scale": scale,
+        "tables": tables,
+        "temp_bytes": temp_bytes,
+        "generate_s": generate_s,
+        "baseline_rss": baseline_rss,
+        "memory_bytes": max(0, peak_rss - baseline_rss),
+    }
+
+
+def _fit(small: float, big: float, small_scale: float, big_scale: float, scale: float) -> float:
+    """Fits a line through two sample measurements and evaluates it at the requested scale."""
+    slope = max(0.0, (big - small) / (big_scale - small_scale))
+    return max(0.0, big + slope * (scale - big_scale))
+
+
+def _existing_parent(path: Union[str, Path]) -> Path:
+    """Returns the closest existing directory of a (possibly not yet existing) path."""
+    path = Path(path).absolute()
+    while not path.exists():
+        path = path.parent
+    return path
+
+
+def fits_on_disk(requirements: Dict[str, int]) -> bool:
+    """Checks that every filesystem has enough free space for the bytes that will be written to paths on it."""
+    required, free = {}, {}
+    for path, size in requirements.items():
+        directory = _existing_parent(path)
+        device = directory.stat().st_dev
+        required[device] = required.get(device, 0) + size
+        free[device] = shutil.disk_usage(directory).free
+    return all(required[device] <= free[device] * DISK_HEADROOM for device in required)
+
+
+def plan_generation(generator: str, **kwargs) -> Dict:
+    """Predicts the output of a `mock tpc-ds`, `tpc-h` or `employee` request from two samples on this machine.
+    Takes the keyword arguments of the generator's `main` and returns the per table estimate (`tables`) and the
+    totals: rows, output bytes, files, peak memory per worker, temp disk, wall time and whether it fits on disk.
+    """
+    scale = kwargs.get("scale_factor")
+    workers = kwargs.get("num_of_threads") or 1
+    parallelism = min(workers, os.cpu_count() or 1)
+
+    with span("plan_generation", generator=generator, scale_factor=scale):
+        samples = []
+        for sample_scale in SAMPLE_SCALES[generator]:
+            # A fresh process per sample, so its peak RSS only covers the sample
+            with ProcessPoolExecutor(max_workers=1) as pool:
+                samples.append(pool.submit(measure_sample, generator, sample_scale, kwargs).result())
+    small, big = samples
+
+    def fit(small_value: float, big_value: float) -> float:
+        """Extrapolates a measurement of the two samples to the requested scale."""
+        return _fit(small_value, big_value, small["scale"], big["scale"], scale)
+
+    tables = []
+    for table, measured in big["tables"].items():
+        rows = int(fit(small["tables"][table]["rows"], measured["rows"]))
+        tables.append(
+            {
+                "table": table,
+                "rows": rows,
+                "bytes": int(rows * measured["bytes"] / max(1, measured["rows"])),
+                "export_s": fit(small["tables"][table]["export_s"], measured["export_s"]),
+            }
+        )
+    total_rows = sum(table["rows"] for table in tables)
+    output_bytes = sum(table["bytes"] for table in tables)
+    export_s = sum(table.pop("export_s") for table in tables)
+    generate_s = fit(small["generate_s"], big["generate_s"])
+    small_rows, big_rows = (sum(table["rows"] for table in sample["tables"].values()) for sample in samples)
+
+    spool_bytes = 0
+    if generator == "employee":
+        chunk_rows = kwargs.get("chunk_rows") or scale
+        files = math.ceil(scale / chunk_rows)
+        if kwargs.get("pipeline"):
+            # The pipeline writer cuts the output into files of the target size instead of one file per chunk
+            files = max(1, math.ceil(output_bytes / ((kwargs.get("target_file_mb") or 128) * 1024**2)))
+            # A sorted dataset keeps every chunk spooled until the writer closes, otherwise a chunk is removed once
+            # written and only the chunks in flight (twice the workers by default) are spooled at the same time
+            spooled_rows = total_rows
+            if not kwargs.get("sort_by"):
+                in_flight = max(workers, kwargs.get("max_in_flight") or 2 * workers)
+                spooled_rows = min(total_rows, in_flight * chunk_rows)
+            spool_bytes = int(spooled_rows * big["temp_bytes"] / max(1, big_rows))
+        worker_rows = min(chunk_rows, scale)
+        wall_time_s = (generate_s + export_s) / parallelism
+        temp_bytes = 0
+    elif generator == "tpc_h":
+        from performance.src.mock_data.tpc.tpc_h import UNSPLIT_TABLES
+
+        chunks = kwargs.get("chunks") or max(4 * workers, scale)
+        files = sum(1 if table["table"] in UNSPLIT_TABLES else chunks for table in tables)
+        worker_rows = math.ceil(total_rows / chunks)
+        wall_time_s = (generate_s + export_s) / parallelism
+        temp_bytes = 0
+    else:
+        # dsdgen builds the whole data set in one process and database file, only the exports run in parallel
+        files = len(tpc_ds.table_chunks([(table["table"], table["rows"]) for table in tables], workers, **kwargs))
+        worker_rows = total_rows
+        wall_time_s = generate_s + export_s / parallelism
+        temp_bytes = int(fit(small["temp_bytes"], big["temp_bytes"]))
+
+    # The memory growth is fitted over the rows of the samples too, so fixed costs (e.g. Faker providers) aren't
+    # counted per row
+    peak_memory = big["baseline_rss"] + _fit(
+        small["memory_bytes"], big["memory_bytes"], small_rows, big_rows, worker_rows
+    )
+    if generator != "employee":
+        peak_memory = min(peak_memory, os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") * DUCKDB_MEMORY_SHARE)
+    target_path = kwargs.get("target_path") or "."
+    spool_path = spool_parent(kwargs.get("spool_dir")) or tempfile.gettempdir()
+    requirements = {}
+    for path, size in ((target_path, output_bytes), (TEMP_PATH, temp_bytes), (spool_path, spool_bytes)):
+        requirements[path] = requirements.get(path, 0) + size
+    return {
+        "generator": generator,
+        "tables": tables,
+        "total_rows": total_rows,
+        "output_bytes": output_bytes,
+        "files": files,
+        "peak_memory_per_worker_bytes": int(peak_memory),
+        "temp_disk_bytes": temp_bytes,
+        "spool_bytes": spool_bytes,
+        "spool_path": spool_path,
+        "wall_time_s": wall_time_s,
+        "free_disk_bytes": shutil.disk_usage(_existing_parent(target_path)).free,
+        "fits_on_disk": fits_on_disk(requirements),
+    }
+
+
+def format_plan(plan: Dict) -> str:
+    """Formats a generation plan as a per table listing followed by the predicted totals."""
+    from performance.src.utilities.common import format_table
+
+    tables = [
+        {"table": table["table"], "rows": table["rows"], "size_mb": round(table["bytes"] / 1024**2, 2)}
+        for table in plan["tables"]
+    ]
+    return "\n".join(
+        [
+            format_table(tables),
+            "",
+            f"Total rows:                 {plan['total_rows']:,}",
+            f"Output size:                {plan['output_bytes'] / 1024**3: .2f} GB",
+            f"Files:                      {plan['files']:,}",
+            f"Peak memory per worker:     {plan['peak_memory_per_worker_bytes'] / 1024**3: .2f} GB",
+            f"Temp disk:                  {plan['temp_disk_bytes'] / 1024**3: .2f} GB",
+            f"Spooled chunks:             {plan['spool_bytes'] / 1024**3: .2f} GB in {plan['spool_path']}",
+            f"Wall time:                  {plan['wall_time_s'] / 60: .1f} minutes",
+            f"Free disk at target:        {plan['free_disk_bytes'] / 1024**3: .2f} GB",
+        ]
+    )
@@ -1,7 +1,12 @@
 """Create TPC-DS tables using DuckDB's TPC-DS extension and export them to Parquet or CSV format."""
 
+import math
+import os
 from pathlib import Path
+from typing import Dict, List, Optional, Tuple
 from performance.src.utilities.duckdb import DuckDBConnection
+from performance.src.utilities.scheduler import run_chunks
+from performance.src.utilities.tracing import span
 
 
 table_name_partition_column = {
@@ -19,6 +24,79 @@ table_name_partition_column = {
     # 'web_sales': 'MOD(ws_item_sk+ ws_order_number, {partition_count})',
 }
 
+# Sort keys that cluster the fact tables on their date key, so date filters can prune row groups on min/max
+table_sort_keys = {
+    "catalog_returns": ["cr_returned_date_sk"],
+    "catalog_sales": ["cs_sold_date_sk"],
+    "inventory": ["inv_date_sk"],
+    "store_returns": ["sr_returned_date_sk"],
+    "store_sales": ["ss_sold_date_sk"],
+    "web_returns": ["wr_returned_date_sk"],
+    "web_sales": ["ws_sold_date_sk"],
+}
+
+# Fewest rows of a chunk a table is split into, smaller tables are exported as one file
+MIN_CHUNK_ROWS = 1_000_000
+
+# Business keys that the TPC-DS queries look up with equality or IN predicates
+table_bloom_filter_columns = {
+    "customer": ["c_customer_id"],
+    "item": ["i_item_id"],
+    "promotion": ["p_promo_id"],
+    "store": ["s_store_id"],
+}
+
+
+def layout_kwargs(table: str, **kwargs) -> Dict:
+    """Returns the export layout keyword arguments of a TPC-DS table for the layout options of the command."""
+    partition_columns = dict(option.split("=", 1) for option in kwargs.get("partition_columns") or [])
+    return {
+        "partition_column": partition_columns.get(table, table_name_partition_column.get(table)),
+        "sort_by": table_sort_keys.get(table) if kwargs.get("sort") else None,
+        "bloom_filter_columns": table_bloom_filter_columns.get(table) if kwargs.get("bloom_filters") else None,
+        "row_group_size": kwargs.get("row_group_size"),
+        "compression": kwargs.get("compression"),
+        "compression_level": kwargs.get("compression_level"),
+    }
+
+
+def table_chunks(tables: List[Tuple[str, int]], workers: int, **kwargs) -> List[Tuple[str, int, int, Optional[int]]]:
+    """Splits the tables into chunks of rowid ranges, about four per worker, so the fact tables are exported by
+    all workers instead of keeping one busy while the others idle. Returns (table, first row, rows, part) with the
+    biggest chunks first, part is None for a table exported as one file.
+    Tables with a partition column are exported as one chunk, their partitions already split them into files.
+    """
+    chunk_rows = max(MIN_CHUNK_ROWS, math.ceil(sum(rows for _, rows in tables) / (4 * workers)))
+    chunks = []
+    for table, rows in tables:
+        if rows <= chunk_rows or layout_kwargs(table, **kwargs)["partition_column"]:
+            chunks.append((table, 0, rows, None))
+            continue
+        for part, first_row in enumerate(range(0, rows, chunk_rows)):
+            chunks.append((table, first_row, min(chunk_rows, rows - first_row), part))
+    # Biggest chunks first, so the small ones fill the gaps at the end of the run
+    return sorted(chunks, key=lambda chunk: chunk[2], reverse=True)
+
+
+def export_tpc_ds_table(input_args) -> int:
+    """Exports one chunk of a TPC-DS table from the generated database, opened read only so chunks export in
+    parallel. A chunk of a split table is written as `<table>_<part>` with its rows sorted on their own when the
+    fact tables are sorted. Returns the number of exported rows.
+    """
+    table, first_row, rows, part, kwargs = input_args
+    chunk = {} if part is None else {"where": f"rowid BETWEEN {first_row} AND {first_row + rows - 1}"}
+    with DuckDBConnection(database=kwargs.get("db_file_path"), read_only=True) as duckdb:
+        duckdb.execute_multiple_queries([f"SET threads = {kwargs.get('threads_per_worker', 1)};"])
+        duckdb.export_table(
+            table,
+            export_type=kwargs.get("export_type"),
+            target_path=kwargs.get("target_path"),
+            file_prefix=table if part is None else f"{table}_{part}",
+            **chunk,
+            **layout_kwargs(table, **kwargs),
+        )
+    return rows
+
 
 def main(**kwargs) -> None:
     """Main function to create TPC-DS tables using DuckDB's TPC-DS extension
@@ -32,21 +110,28 @@ def main(**kwargs) -> None:
     Path(db_file_path.parent).mkdir(parents=True, exist_ok=True)
 
     with DuckDBConnection(database=db_file_path) as duckdb:
-        duckdb.execute_multiple_queries(
-            ["INSTALL tpcds;", "LOAD tpcds;", f"""CALL dsdgen(sf = {kwargs.get("scale_factor")}, keys = true);"""]
-        )
+        with span("dsdgen", scale_factor=kwargs.get("scale_factor")):
+            duckdb.execute_multiple_queries(
+                ["INSTALL tpcds;", "LOAD tpcds;", f"""CALL dsdgen(sf = {kwargs.get("scale_factor")}, keys = true);"""]
+            )
 
-        tables = duckdb.conn.execute("show tables;").fetchall()
+        # Exact row counts, the rowid ranges of the chunks have to cover every row
+        tables = [
+            (table, duckdb.execute_query(f"SELECT count(*) FROM {table}")[0][0])
+            for (table,) in duckdb.execute_query("SELECT table_name FROM duckdb_tables()")
+        ]
         queries = duckdb.conn.execute("FROM tpcds_queries()").fetchall()
 
-        for (table,) in tables:
-            Path(f"""{kwargs.get("target_path")}/{table}""").mkdir(parents=True, exist_ok=True)
-            duckdb.export_table(
-                table,
-                export_type=kwargs.get("export_type"),
-                target_path=kwargs.get("target_path"),
-                partition_column=table_name_partition_column.get(table),
-            )
+    workers = kwargs.get("num_of_threads") or 1
+    options = {**kwargs, "db_file_path": db_file_path, "threads_per_worker": max(1, (os.cpu_count() or 1) // workers)}
+    run_chunks(
+        export_tpc_ds_table,
+        [(*chunk, options) for chunk in table_chunks(tables, workers, **kwargs)],
+        workers=workers,
+        max_in_flight=kwargs.get("max_in_flight"),
+        label="tpc_ds",
+        total_rows=sum(rows for _, rows in tables),
+    )
 
     for query in queries:
         with open(Path(kwargs.get("sql_path"), f"{query[0]}.sql"), "w") as f:
@@ -1,37 +1,105 @@
 """Create TPC-H tables using DuckDB's TPC-H extension and export them to Parquet or CSV format."""
 
-from multiprocessing import Pool
+import os
 from pathlib import Path
+from typing import Optional
 from performance.src.utilities.duckdb import DuckDBConnection
+from performance.src.utilities.scheduler import run_chunks
+from performance.src.utilities.tracing import span
 
+# Tables that dbgen doesn't split into children, they are only exported by the first step
+UNSPLIT_TABLES = ["nation", "region"]
 
-def create_tpc_h_tables(input_args):
+
+def create_tpc_h_tables(input_args) -> int:
     """Creates TPC-H tables using DuckDB's TPC-H extension and exports them to the specified format (Parquet or CSV).
-    The function is designed to be run in parallel across multiple threads,
-    with each thread generating a portion of the data based on the provided scale factor and run index.
+    The function is designed to be run in parallel across multiple processes,
+    with each process generating one of `chunks` portions of the data based on the provided scale factor and run index.
+    Returns the number of exported rows.
     """
     run, kwargs = input_args
 
-    with DuckDBConnection() as duckdb:
+    rows = 0
+    with DuckDBConnection() as duckdb, span("tpc_h_step", step=run, scale_factor=kwargs.get("scale_factor")):
         duckdb.execute_multiple_queries(
             [
+                f"SET threads = {kwargs.get('threads_per_worker', 1)};",
                 "INSTALL tpch;",
                 "LOAD tpch;",
                 f"""CALL dbgen(
                     sf ={kwargs.get("scale_factor")},
-                    children = {kwargs.get("scale_factor")},
-                    step = {run}, suffix = '_{run}' );
+                    children = {kwargs.get("chunks")},
+                    step = {run});
                 """,
             ]
         )
         tables = duckdb.conn.execute("show tables;").fetchall()
-        for table in tables:
+        for (table,) in tables:
+            if run > 0 and table in UNSPLIT_TABLES:
+                continue
+            rows += duckdb.execute_query(f"SELECT count(*) FROM {table}")[0][0]
             duckdb.export_table(
                 table,
                 export_type=kwargs.get("export_type"),
-                target_path=f"{kwargs.get('export_type')}/{table}",
+                target_path=kwargs.get("target_path"),
                 file_prefix=f"part_{run}",
             )
+    return rows
+
+
+# Orders inserted by RF1 and deleted by RF2 per refresh stream and scale factor, as in the TPC-H specification
+REFRESH_ORDERS_PER_SCALE_FACTOR = 1500
+
+
+def refresh_stream_path(refresh_path: str, stream: int) -> Path:
+    """Returns the directory that holds the RF1 and RF2 datasets of a refresh stream."""
+    return Path(refresh_path, f"stream_{stream}")
+
+
+def create_refresh_sets(
+    scale_factor: float, refresh_streams: int, refresh_path: str, database: Optional[str] = None
+) -> None:
+    """Creates the refresh function datasets of `refresh_streams` streams as Parquet.
+    Each stream gets `rf1_orders` and `rf1_lineitem` (new orders and their lineitems for RF1) and
+    `rf2_orders` (the keys of existing orders that RF2 deletes together with their lineitems).
+    New orders are copies of sampled existing orders under fresh keys above the highest key of the initial load,
+    deleted keys are disjoint between streams. The initial load is generated in memory with dbgen when no DuckDB
+    `database` holding it is given, it has to be the same load the refreshes are later applied to.
+    """
+    with DuckDBConnection(database=database or ":memory:") as duckdb:
+        if not database:
+            duckdb.execute_multiple_queries(["INSTALL tpch;", "LOAD tpch;", f"CALL dbgen(sf = {scale_factor});"])
+        orders_per_stream = max(1, int(REFRESH_ORDERS_PER_SCALE_FACTOR * scale_factor))
+        max_key = duckdb.execute_query("SELECT max(o_orderkey) FROM orders")[0][0]
+
+        for stream in range(1, refresh_streams + 1):
+            first_key = max_key + (stream - 1) * orders_per_stream
+            with span("tpc_h_refresh_set", stream=stream, orders=orders_per_stream):
+                duckdb.execute_multiple_queries(
+                    [
+                        f"""CREATE OR REPLACE TEMP TABLE refresh_keys AS
+                            SELECT o_orderkey AS old_key, {first_key} + row_number() OVER (ORDER BY o_orderkey) AS new_key
+                            FROM (SELECT o_orderkey FROM orders USING SAMPLE reservoir({orders_per_stream} ROWS)
+                            REPEATABLE ({stream}))""",
+                        """CREATE OR REPLACE TEMP TABLE rf1_orders AS
+                            SELECT orders.* REPLACE (new_key AS o_orderkey)
+                            FROM orders JOIN refresh_keys ON o_orderkey = old_key""",
+                        """CREATE OR REPLACE TEMP TABLE rf1_lineitem AS
+                            SELECT lineitem.* REPLACE (new_key AS l_orderkey)
+                            FROM lineitem JOIN refresh_keys ON l_orderkey = old_key""",
+                        f"""CREATE OR REPLACE TEMP TABLE rf2_orders AS
+                            SELECT o_orderkey FROM orders ORDER BY o_orderkey
+                            LIMIT {orders_per_stream} OFFSET {(stream - 1) * orders_per_stream}""",
+                    ]
+                )
+                for table in ("rf1_orders", "rf1_lineitem", "rf2_orders"):
+                    duckdb.export_table(
+                        table,
+                        export_type="parquet",
+                        target_path=refresh_stream_path(refresh_path, stream),
+                        file_prefix=table,
+                    )
+            print(f"Created refresh stream {stream} with {orders_per_stream} orders in {refresh_path}", flush=True)
 
 
 def main(**kwargs) -> None:
@@ -40,14 +108,19 @@ def main(**kwargs) -> None:
 
     Path(kwargs.get("sql_path")).mkdir(parents=True, exist_ok=True)
 
-    with Pool(processes=kwargs.get("num_of_threads")) as pool:
-        pool.map(create_tpc_h_tables, range(0, kwargs.get("scale_factor")))
+    # Many more chunks than processes, so idle processes keep pulling steps until the tail of the run
+    workers = kwargs.get("num_of_threads")
+    chunks = kwargs.get("chunks") or max(4 * workers, kwargs.get("scale_factor"))
+    options = {**kwargs, "chunks": chunks, "threads_per_worker": max(1, (os.cpu_count() or 1) // workers)}
+    run_chunks(
+        create_tpc_h_tables,
+        [(run, options) for run in range(chunks)],
+        workers=workers,
+        max_in_flight=kwargs.get("max_in_flight"),
+        label="tpc_h",
+    )
 
     with DuckDBConnection() as duckdb:
-        tables = duckdb.conn.execute("show tables;").fetchall()
-        for table in tables:
-            Path(f"""{kwargs.get("export_type")}/{table}""").mkdir(parents=True, exist_ok=True)
-
         duckdb.execute_multiple_queries(["INSTALL tpch;", "LOAD tpch;"])
 
         queries = duckdb.conn.execute("FROM tpch_queries()").fetchall()
@@ -1,9 +1,13 @@
 """Common Utilities"""
 
-from functools import cache
+from functools import cache, wraps
 from pathlib import Path
+from typing import Dict, Iterable, List, Union
+import os
 import time
 
+from performance.src.utilities.tracing import span
+
 
 @cache
 def project_path() -> str:
@@ -24,8 +28,9 @@ def api_path() -> str:
 
 
 def timer(func):
-    """Decorator to log the execution time of a function"""
+    """Decorator to log the execution time of a function, the call is also recorded as a tracing span"""
 
+    @wraps(func)
     def wrapper(*args, **kwargs):
         start_time = time.time()
         print(
@@ -33,9 +38,59 @@ def timer(func):
             f"started at: {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(start_time))}",
             flush=True,
         )
-        result = func(*args, **kwargs)
+        with span(func.__name__):
+            result = func(*args, **kwargs)
         end_time = time.time()
         print(f"Execution time for {func.__name__}: {end_time - start_time: .4f} seconds", flush=True)
         return result
 
     return wrapper
+
+
+def format_table(rows: List[Dict]) -> str:
+    """Formats a list of dicts that share the same keys as a plain text table for printing."""
+    if not rows:
+        return "(no rows)"
+
+    def render(value) -> str:
+        if value is None:
+            return "-"
+        return f"{value:.4f}" if isinstance(value, float) else str(value)
+
+    columns = list(rows[0].keys())
+    cells = [[render(row.get(column)) for column in columns] for row in rows]
+    widths = [max(len(column), *(len(row[i]) for row in cells)) for i, column in enumerate(columns)]
+    lines = ["  ".join(column.ljust(width) for column, width in zip(columns, widths))]
+    lines.append("  ".join("-" * width for width in widths))
+    lines.extend("  ".join(cell.rjust(width) for cell, width in zip(row, widths)) for row in cells)
+    return "\n".join(lines)
+
+
+def drop_os_caches(paths: Iterable[Union[str, Path]] = ()) -> str:
+    """Drops the whole OS page cache when running as root, otherwise evicts just the given files.
+    Returns the method that was used: `drop_caches`, `fadvise` or `none`.
+    """
+    try:
+        os.sync()
+        with open("/proc/sys/vm/drop_caches", "w") as fp:
+            fp.write("3\n")
+        return "drop_caches"
+    except OSError:
+        files = [file for path in paths for file in ([Path(path)] if Path(path).is_file() else Path(path).rglob("*"))]
+        return "fadvise" if drop_page_cache(file for file in files if file.is_file()) else "none"
+
+
+def drop_page_cache(paths: Iterable[Union[str, Path]]) -> bool:
+    """Asks the kernel to evict the given files from the OS page cache, which doesn't need root for clean pages.
+    Returns False if the platform doesn't support it, in which case reads may still be served from memory.
+    """
+    if not hasattr(os, "posix_fadvise"):
+        return False
+    for path in paths:
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            os.fdatasync(fd)
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        finally:
+            os.close(fd)
+    return True
@@ -1,9 +1,18 @@
 """A utility class for managing DuckDB connections and executing queries."""
 
 import duckdb
-from typing import Union
+from typing import List, Union
 from pathlib import Path
 
+from performance.src.utilities.tracing import span
+
+# File extension of CSV exports per compression codec
+EXTENSIONS = {"gzip": "csv.gz", "zstd": "csv.zst"}
+
+# Dictionary size limit (bytes) used when bloom filters are requested without an explicit limit,
+# DuckDB reserves memory proportional to it for every column so keep it close to a row group of keys
+BLOOM_FILTER_DICTIONARY_SIZE_LIMIT = 4 * 1024 * 1024
+
 
 class DuckDBConnection:
     """A context manager for managing a connection to a DuckDB database and executing SQL queries.
@@ -20,16 +29,18 @@ class DuckDBConnection:
     and the connection is automatically closed when exiting the context.
 
     Note: If no database file is specified, it will use an in-memory database by default.
+    A database file opened with `read_only=True` can be opened by multiple processes at the same time.
     """
 
-    def __init__(self, database: Union[str, Path] = ":memory:"):
+    def __init__(self, database: Union[str, Path] = ":memory:", read_only: bool = False):
         """Initializes the DuckDBConnection with the provided database name or path."""
         self.database = str(database)
+        self.read_only = read_only
         self.conn: duckdb.DuckDBPyConnection
 
     def __enter__(self):
         """Establishes a connection to the DuckDB database using the provided database name or path."""
-        self.conn = duckdb.connect(database=self.database)
+        self.conn = duckdb.connect(database=self.database, read_only=self.read_only)
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
@@ -45,8 +56,35 @@ class DuckDBConnection:
         for query in queries:
             self.conn.execute(query)
 
+    def execute_query(self, query):
+        """Executes a SQL query and returns the results as a list of tuples."""
+        return self.conn.execute(query).fetchall()
+
+    def interrupt(self) -> None:
+        """Cancels the query that is currently running on the connection, can be called from another thread."""
+        self.conn.interrupt()
+
+    def reopen(self) -> None:
+        """Opens a new connection in place of the current one, e.g. after a query ignored `interrupt`.
+        The old connection is not closed, it still belongs to the thread that runs the stuck query.
+        """
+        self.__enter__()
+
+    def set_memory_limit(self, megabytes: int) -> None:
+        """Limits the memory DuckDB may use, queries that need more spill to disk or fail with out of memory."""
+        self.conn.execute(f"SET memory_limit = '{megabytes}MB'")
+
+    def stage_batch(self, name: str, table: str, batch) -> None:
+        """Makes a pyarrow record batch of rows (or key columns) of `table` queryable as `name`."""
+        self.conn.register(name, batch)
+
     def export_table(self, table, **kwargs) -> None:
-        """Exports a table from the DuckDB database to a specified format (Parquet or CSV) and target path."""
+        """Exports a table from the DuckDB database to a specified format (Parquet or CSV) and target path.
+        `partition_column` writes a Hive style partitioned dataset on one or more (comma separated) columns and
+        `sort_by` orders the rows before writing so min/max statistics allow engines to prune row groups, `where`
+        exports only the rows matching a condition (e.g. a `rowid` range, to export a table in chunks).
+        See `layout_options` for the remaining layout keyword arguments.
+        """
         export_type = kwargs.get("export_type", "csv")
         target_path = kwargs.get("target_path", "exported_data")
         file_prefix = kwargs.get("file_prefix", table)
@@ -96,19 +134,70 @@ class DuckDBConnection:
         #                             (FORMAT CSV, HEADER)"""
         #             )
 
+        copy_options = ["FORMAT PARQUET"] if export_type == "parquet" else ["FORMAT CSV", "HEADER"]
         if partition_column:
-            if export_type == "parquet":
-                self.conn.execute(
-                    f"""COPY {table} TO '{target_path}/{table}/{file_prefix}'
-                        (FORMAT PARQUET, PARTITION_BY ({partition_column}))"""
-                )
-            elif export_type == "csv":
-                self.conn.execute(
-                    f"""COPY {table}  TO '{target_path}/{table}/{file_prefix}'
-                        (FORMAT CSV, HEADER, PARTITION_BY ({partition_column}))"""
-                )
-        else:
-            if export_type == "parquet":
-                self.conn.execute(f"""COPY {table} TO '{target_path}/{table}/{file_prefix}.parquet' (FORMAT PARQUET)""")
-            elif export_type == "csv":
-                self.conn.execute(f"""COPY {table} TO '{target_path}/{table}/{file_prefix}.csv' (FORMAT CSV, HEADER)""")
+            copy_options.append(f"PARTITION_BY ({partition_column})")
+        copy_options.extend(self.layout_options(**kwargs))
+
+        sort_by, where = kwargs.get("sort_by"), kwargs.get("where")
+        source = table
+        if sort_by or where:
+            source = f"(SELECT * FROM {table}"
+            source += f" WHERE {where}" if where else ""
+            source += f" ORDER BY {', '.join(sort_by)})" if sort_by else ")"
+        extension = "parquet" if export_type == "parquet" else EXTENSIONS.get(kwargs.get("compression"), "csv")
+        target = f"{target_path}/{table}/{file_prefix}" + ("" if partition_column else f".{extension}")
+
+        Path(target_path, table).mkdir(parents=True, exist_ok=True)
+        with span("export_table", table=table, export_type=export_type, partitioned=bool(partition_column)):
+            self.conn.execute(f"""COPY {source} TO '{target}' ({", ".join(copy_options)})""")
+
+        if kwargs.get("bloom_filter_columns") and export_type == "parquet":
+            self.check_bloom_filters(
+                target if not partition_column else f"{target}/**/*.parquet", kwargs["bloom_filter_columns"]
+            )
+
+    @staticmethod
+    def layout_options(**kwargs) -> List[str]:
+        """Returns the COPY options that control the physical layout of an export.
+        Supported keyword arguments are `compression` and, for Parquet only, `compression_level`,
+        `row_group_size`, `dictionary_size_limit` (bytes, 0 disables dictionary encoding),
+        `bloom_filter_columns` and `bloom_filter_false_positive_ratio`.
+        """
+        options = []
+        if kwargs.get("compression"):
+            options.append(f"COMPRESSION {kwargs['compression']}")
+        if kwargs.get("export_type", "csv") != "parquet":
+            return options
+
+        if kwargs.get("compression_level") is not None:
+            options.append(f"COMPRESSION_LEVEL {kwargs['compression_level']}")
+        if kwargs.get("row_group_size"):
+            options.append(f"ROW_GROUP_SIZE {kwargs['row_group_size']}")
+
+        # DuckDB only writes bloom filters for dictionary encoded columns, raise the dictionary limit so that
+        # high cardinality key columns requested for bloom filters stay dictionary encoded.
+        dictionary_size_limit = kwargs.get("dictionary_size_limit")
+        if dictionary_size_limit is None and kwargs.get("bloom_filter_columns"):
+            dictionary_size_limit = BLOOM_FILTER_DICTIONARY_SIZE_LIMIT
+        if dictionary_size_limit is not None:
+            options.append(f"DICTIONARY_SIZE_LIMIT {dictionary_size_limit}")
+        if kwargs.get("bloom_filter_false_positive_ratio"):
+            options.append(f"BLOOM_FILTER_FALSE_POSITIVE_RATIO {kwargs['bloom_filter_false_positive_ratio']}")
+        return options
+
+    def check_bloom_filters(self, path: str, columns: List[str]) -> None:
+        """Warns about requested bloom filter columns that ended up without a bloom filter in some row group."""
+        missing = self.conn.execute(
+            f"""SELECT DISTINCT path_in_schema
+                FROM parquet_metadata('{path}')
+                WHERE list_contains(?, path_in_schema)
+                AND bloom_filter_offset IS NULL""",
+            [list(columns)],
+        ).fetchall()
+        if missing:
+            print(
+                f"Warning: no bloom filter written for {', '.join(column for (column,) in missing)} in {path}, "
+                f"raise dictionary_size_limit so these columns stay dictionary encoded",
+                flush=True,
+            )
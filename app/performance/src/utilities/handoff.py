@@ -0,0 +1,252 @@
+"""Hands generated chunks from worker processes to a single writer through memory-mapped Arrow IPC files.
+
+A worker publishes its chunk as an Arrow IPC file in a spool directory on shared memory (`/dev/shm` when it
+exists) and returns only the path, so nothing but the path is pickled. The writer memory-maps the file and reads
+the record batches without copying them, then lays out the final dataset:
+- files of `target_file_bytes`, written in row groups sized by the bytes per row measured on the file so far (or
+  on the previous file) with room left for the Parquet footer, until a file is within `SIZE_TOLERANCE` of the target;
+- optionally a global sort on a column, the chunks are kept mapped until the last one arrived and only the sort
+  indices of the key column are computed before the rows are gathered file by file;
+- a `_manifest.json` listing every file with its rows, bytes and the key range of the sort column.
+Example usage:
+```python
+def generate(chunk) -> str:
+    return publish(pa.Table.from_pylist(rows), spool_dir, f"chunk_{chunk}")
+
+writer = DatasetWriter("output", "parquet", sort_by="id")
+run_chunks(generate, chunks, workers=8, consume=writer.consume)
+writer.close()
+```
+"""
+
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as csv
+import pyarrow.parquet as pq
+
+from performance.src.utilities.tracing import span
+
+MANIFEST_FILE = "_manifest.json"
+
+# Upper bound of the rows of a row group, DuckDB's default row group size
+MAX_ROW_GROUP_ROWS = 122880
+
+# Share of the target size a file may stay below when it is finished
+SIZE_TOLERANCE = 0.01
+
+# Share of the rows that still fit into a file written as the next row group, the rest is measured again
+GROUP_SHARE = 0.9
+
+# Rows gathered per step of the global sort, bounds the memory of the gathered (copied) rows
+SORT_GATHER_ROWS = 1_000_000
+
+
+def spool_parent(parent: Optional[str] = None) -> Optional[str]:
+    """Returns the directory the spool directory is created in, shared memory unless `parent` is given.
+    None stands for the default temp directory when there is no `/dev/shm`.
+    """
+    if parent is None and Path("/dev/shm").is_dir():
+        return "/dev/shm"
+    return parent
+
+
+def spool_directory(parent: Optional[str] = None) -> str:
+    """Creates a spool directory for the handoff files, on shared memory unless `parent` is given."""
+    parent = spool_parent(parent)
+    if parent:
+        Path(parent).mkdir(parents=True, exist_ok=True)
+    return tempfile.mkdtemp(prefix="db_perf_handoff_", dir=parent)
+
+
+def publish(table: pa.Table, spool_dir: Union[str, Path], name: str) -> str:
+    """Writes a table as an Arrow IPC file to the spool directory and returns its path."""
+    path = str(Path(spool_dir, f"{name}.arrow"))
+    with span("publish", chunk=name, rows=table.num_rows):
+        with pa.OSFile(path, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    return path
+
+
+def open_published(path: Union[str, Path]) -> pa.Table:
+    """Memory-maps a published Arrow IPC file, the buffers of the returned table point into the mapping."""
+    return pa.ipc.open_file(pa.memory_map(str(path), "r")).read_all()
+
+
+class DatasetWriter:
+    """Writes tables handed over by workers into size-targeted files and a manifest, optionally sorted globally."""
+
+    def __init__(
+        self,
+        target_path: Union[str, Path],
+        export_type: str = "parquet",
+        target_file_bytes: int = 128 * 1024**2,
+        sort_by: Optional[str] = None,
+        file_prefix: str = "part",
+        schema: Optional[pa.Schema] = None,
+    ):
+        """Initializes a writer for the dataset in `target_path`, files are written on `consume` or `close`.
+        Every file gets `schema`, or the schema of the first table written, later tables are cast to it. Chunks
+        with columns that can be all null need the schema, Arrow types such columns as `null`. A `sort_by` column
+        that isn't in the given schema is refused right away.
+        """
+        if sort_by and schema is not None and sort_by not in schema.names:
+            raise ValueError(f"Sort column '{sort_by}' is not in the schema of the dataset: {', '.join(schema.names)}")
+        self.target_path = Path(target_path)
+        self.target_path.mkdir(parents=True, exist_ok=True)
+        self.export_type = export_type
+        self.target_file_bytes = target_file_bytes
+        self.sort_by = sort_by
+        self.file_prefix = file_prefix
+        self.files: List[Dict] = []
+        self.pending: List[pa.Table] = []
+        self.published: List[str] = []
+        self._sink = None
+        self._writer = None
+        self._file: Optional[Dict] = None
+        self._groups = 0
+        self._schema = schema
+        self._bytes_per_row: Optional[float] = None
+        self._footer_bytes: Optional[float] = None
+
+    def consume(self, path: str) -> int:
+        """Takes over a published chunk and returns its number of rows.
+        Without a sort column the chunk is written right away and its file removed, with one the chunk stays
+        mapped until `close`.
+        """
+        table = open_published(path)
+        if self.sort_by:
+            self.pending.append(table)
+            self.published.append(path)
+        else:
+            self.write(table)
+            os.unlink(path)
+        return table.num_rows
+
+    def _open_file(self) -> None:
+        """Starts the next output file."""
+        path = Path(self.target_path, f"{self.file_prefix}_{len(self.files)}.{self.export_type}")
+        self._sink = pa.OSFile(str(path), "wb")
+        if self.export_type == "csv":
+            self._writer = csv.CSVWriter(self._sink, self._schema)
+        else:
+            self._writer = pq.ParquetWriter(self._sink, self._schema)
+        self._file = {"path": path.name, "rows": 0}
+        self._groups = 0
+
+    def _close_file(self) -> None:
+        """Finishes the current output file and adds it to the manifest."""
+        data_bytes = self._sink.tell()
+        self._writer.close()
+        self._sink.close()
+        self._file["bytes"] = Path(self.target_path, self._file["path"]).stat().st_size
+        self._bytes_per_row = data_bytes / self._file["rows"]
+        self._footer_bytes = (self._file["bytes"] - data_bytes) / self._groups
+        self.files.append(self._file)
+        self._writer, self._sink, self._file = None, None, None
+
+    def _footer_bytes_per_group(self, table: pa.Table) -> float:
+        """Returns the bytes a row group adds to the footer of a file, as measured on the previous file.
+        Before the first file is finished a Parquet file with a row group of a few rows is written to memory.
+        """
+        if self._footer_bytes is None:
+            self._footer_bytes = 0.0
+            if self.export_type != "csv":
+                sink = pa.BufferOutputStream()
+                with pq.ParquetWriter(sink, self._schema) as writer:
+                    writer.write_table(table.slice(0, 100))
+                    data_bytes = sink.tell()
+                self._footer_bytes = float(sink.tell() - data_bytes)
+        return self._footer_bytes
+
+    def _free_bytes(self, table: pa.Table, groups: int) -> float:
+        """Returns the bytes left in the current file once its footer has room for `groups` row groups."""
+        return self.target_file_bytes - self._sink.tell() - groups * self._footer_bytes_per_group(table)
+
+    def _next_group_rows(self, table: pa.Table) -> int:
+        """Returns the rows of the next row group of the current file.
+        The bytes per row are measured on the rows written to the file so far, or on the previous file. Only
+        `GROUP_SHARE` of the rows that still fit are written, so the last rows are sized by a fresh measurement
+        instead of overshooting the target when the compression of the rows changes. Before anything was written a
+        quarter of the rows the in-memory size gives are written to measure them, as text formats can be larger.
+        """
+        written = self._sink.tell()
+        if self._file["rows"] and written:
+            bytes_per_row = written / self._file["rows"]
+        elif self._bytes_per_row:
+            bytes_per_row = self._bytes_per_row
+        else:
+            return max(1, round(self.target_file_bytes * table.num_rows / max(1, table.nbytes) / 4))
+        return max(1, int(GROUP_SHARE * self._free_bytes(table, self._groups + 1) / bytes_per_row))
+
+    def _track_range(self, group: pa.Table) -> None:
+        """Extends the key range of the current file with the sort column of a row group."""
+        if not self.sort_by:
+            return
+        low, high = pc.min_max(group[self.sort_by]).values()
+        low, high = low.as_py(), high.as_py()
+        self._file["min"] = low if self._file.get("min") is None else min(self._file["min"], low)
+        self._file["max"] = high if self._file.get("max") is None else max(self._file["max"], high)
+
+    def write(self, table: pa.Table) -> None:
+        """Appends rows to the dataset, starting a new file whenever the current one reached the target size."""
+        if self._schema is None:
+            self._schema = table.schema
+        elif table.schema != self._schema:
+            try:
+                table = table.cast(self._schema)
+            except (pa.ArrowInvalid, pa.ArrowNotImplementedError) as e:
+                raise ValueError(f"Rows don't match the schema of the dataset, pass it to DatasetWriter: {e}") from e
+        offset = 0
+        while offset < table.num_rows:
+            if self._writer is None:
+                self._open_file()
+            group = table.slice(offset, min(MAX_ROW_GROUP_ROWS, self._next_group_rows(table)))
+            if self.export_type == "csv":
+                self._writer.write_table(group)
+            else:
+                self._writer.write_table(group, row_group_size=group.num_rows)
+            self._track_range(group)
+            self._file["rows"] += group.num_rows
+            self._groups += 1
+            offset += group.num_rows
+            if self._free_bytes(table, self._groups) < self.target_file_bytes * SIZE_TOLERANCE:
+                self._close_file()
+
+    def _write_sorted(self) -> None:
+        """Writes the pending chunks in the order of the sort column."""
+        # Columns that were all null in some chunks are promoted to the type of the other chunks
+        table = pa.concat_tables(self.pending, promote_options="permissive")
+        with span("sort", rows=table.num_rows, sort_by=self.sort_by):
+            indices = pc.sort_indices(table[self.sort_by])
+        for offset in range(0, len(indices), SORT_GATHER_ROWS):
+            self.write(table.take(indices.slice(offset, SORT_GATHER_ROWS)))
+        self.pending = []
+        for path in self.published:
+            os.unlink(path)
+        self.published = []
+
+    def close(self) -> Dict:
+        """Writes what is still pending, finishes the last file and writes the manifest. Returns the manifest."""
+        with span("write_dataset", target_path=str(self.target_path), sort_by=self.sort_by) as attrs:
+            if self.pending:
+                self._write_sorted()
+            if self._writer is not None:
+                self._close_file()
+            manifest = {
+                "format": self.export_type,
+                "sort_by": self.sort_by,
+                "target_file_bytes": self.target_file_bytes,
+                "rows": sum(file["rows"] for file in self.files),
+                "bytes": sum(file["bytes"] for file in self.files),
+                "files": self.files,
+            }
+            with open(Path(self.target_path, MANIFEST_FILE), "w") as fp:
+                json.dump(manifest, fp, indent=2, default=str)
+            attrs.update(files=len(self.files), rows=manifest["rows"])
+        return manifest
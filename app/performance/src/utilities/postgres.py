@@ -1,6 +1,9 @@
 """This module provides a class for managing a connection to a PostgreSQL database and executing SQL queries."""
 
+import io
+
 import psycopg2
+import pyarrow.csv as csv
 from pydantic import SecretStr
 
 
@@ -36,10 +39,49 @@ class PostgresConnection:
         self.close()
 
     def execute_query(self, query):
-        """Executes a SQL query and returns the results as a list of tuples."""
+        """Executes a SQL query and returns the results as a list of tuples.
+        A failed query is rolled back so the connection can be used for the next query.
+        """
+        try:
+            with self.connection.cursor() as cursor:
+                cursor.execute(query)
+                return cursor.fetchall()
+        except psycopg2.Error:
+            self.connection.rollback()
+            raise
+
+    def interrupt(self) -> None:
+        """Cancels the query that is currently running on the connection (like `pg_cancel_backend`),
+        can be called from another thread.
+        """
+        self.connection.cancel()
+
+    def reopen(self) -> None:
+        """Opens a new connection in place of the current one, e.g. after a query ignored `interrupt`.
+        The old connection is not closed, it still belongs to the thread that runs the stuck query.
+        """
+        self.__enter__()
+
+    def set_statement_timeout(self, seconds: float) -> None:
+        """Makes the server cancel every query of this session that runs longer than `seconds`."""
+        self.execute_multiple_queries([f"SET statement_timeout = {int(seconds * 1000)}"])
+
+    def set_memory_limit(self, megabytes: int) -> None:
+        """Limits the memory of each sort and hash operation of a query (`work_mem`), bigger ones spill to disk."""
+        self.execute_multiple_queries([f"SET work_mem = '{megabytes}MB'"])
+
+    def stage_batch(self, name: str, table: str, batch) -> None:
+        """Loads a pyarrow record batch of rows (or key columns) of `table` into the temporary table `name` with COPY.
+        The staged rows are committed by the next `execute_multiple_queries` call.
+        """
+        columns = ", ".join(batch.schema.names)
+        buffer = io.BytesIO()
+        csv.write_csv(batch, buffer)
+        buffer.seek(0)
         with self.connection.cursor() as cursor:
-            cursor.execute(query)
-            return cursor.fetchall()
+            cursor.execute(f"CREATE TEMP TABLE IF NOT EXISTS {name} AS SELECT {columns} FROM {table} WITH NO DATA")
+            cursor.execute(f"TRUNCATE {name}")
+            cursor.copy_expert(f"COPY {name} ({columns}) FROM STDIN WITH (FORMAT CSV, HEADER)", buffer)
 
     def close(self):
         """Closes the connection to the PostgreSQL database."""
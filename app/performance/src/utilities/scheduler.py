@@ -0,0 +1,113 @@
+"""Job scheduler shared by the mock data generators and exports.
+
+Work is split into many small chunks that a pool of worker processes pulls one at a time, so a slow chunk only
+delays the worker that runs it while the others keep pulling the remaining chunks. At most `max_in_flight` chunks
+are submitted at once, which bounds the memory and disk used by chunks that are produced but not yet written.
+Progress (chunks, rows/s and ETA) is reported while the chunks run.
+Example usage:
+```python
+def generate(chunk) -> int:
+    ...  # generate and write the chunk, return the number of rows written
+
+rows = run_chunks(generate, chunks=list(range(100)), workers=8, label="employee")
+```
+"""
+
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Callable, Iterable, Optional
+
+from performance.src.utilities.tracing import counter, span
+
+# Seconds between two progress lines
+PROGRESS_INTERVAL = 1.0
+
+
+class Progress:
+    """Tracks finished chunks and rows of a scheduled job and prints throughput and remaining time."""
+
+    def __init__(self, label: str, total_chunks: int, total_rows: Optional[int] = None):
+        """Initializes the progress of a job with a known number of chunks and optionally rows."""
+        self.label = label
+        self.total_chunks = total_chunks
+        self.total_rows = total_rows
+        self.chunks = 0
+        self.rows = 0
+        self.started = time.perf_counter()
+        self.reported = self.started
+
+    def update(self, rows: int) -> None:
+        """Records a finished chunk and prints the progress if the last line is older than `PROGRESS_INTERVAL`."""
+        self.chunks += 1
+        self.rows += rows or 0
+        elapsed = time.perf_counter() - self.started
+        counter(
+            f"progress:{self.label}",
+            chunks=self.chunks,
+            total_chunks=self.total_chunks,
+            rows=self.rows,
+            rows_per_s=round(self.rows / elapsed, 2) if elapsed else 0.0,
+            eta_s=self.eta(),
+        )
+        if time.perf_counter() - self.reported >= PROGRESS_INTERVAL or self.chunks == self.total_chunks:
+            self.report()
+
+    def eta(self) -> Optional[float]:
+        """Returns the estimated seconds until the job finishes, based on rows when their total is known."""
+        elapsed = time.perf_counter() - self.started
+        if self.total_rows and self.rows:
+            return elapsed * (self.total_rows - self.rows) / self.rows
+        if self.chunks:
+            return elapsed * (self.total_chunks - self.chunks) / self.chunks
+        return None
+
+    def report(self) -> None:
+        """Prints one progress line, overwritten in place on a terminal."""
+        self.reported = time.perf_counter()
+        elapsed = self.reported - self.started
+        eta = self.eta()
+        line = (
+            f"[{self.label}] {self.chunks}/{self.total_chunks} chunks, {self.rows:,} rows, "
+            f"{self.rows / elapsed if elapsed else 0:,.0f} rows/s, "
+            f"ETA {f'{eta:.0f}s' if eta is not None else '?'}"
+        )
+        done = self.chunks == self.total_chunks
+        print(line, end="\n" if done or not sys.stdout.isatty() else "\r", flush=True)
+
+
+def run_chunks(
+    function: Callable,
+    chunks: Iterable,
+    workers: int,
+    max_in_flight: Optional[int] = None,
+    label: str = "chunks",
+    total_rows: Optional[int] = None,
+    consume: Optional[Callable] = None,
+) -> int:
+    """Runs `function(chunk)` for every chunk on `workers` processes and returns the sum of the returned row counts.
+    Chunks are submitted in the given order, pass the biggest ones first to keep the tail of the run short.
+    `max_in_flight` (default twice the workers) caps the chunks that are submitted but not finished.
+    With `consume`, the result of every finished chunk is passed to it in this process (e.g. the path of a chunk
+    handed over to a writer) and `consume` returns the row count instead.
+    """
+    chunks = list(chunks)
+    max_in_flight = max(workers, max_in_flight or 2 * workers)
+    progress = Progress(label, len(chunks), total_rows)
+    pending = iter(chunks)
+    running = set()
+
+    with span("run_chunks", label=label, chunks=len(chunks), workers=workers) as attrs:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            while True:
+                for chunk in pending:
+                    running.add(executor.submit(function, chunk))
+                    if len(running) >= max_in_flight:
+                        break
+                if not running:
+                    break
+                finished, running = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    progress.update(consume(future.result()) if consume else future.result())
+        attrs["rows"] = progress.rows
+    return progress.rows
@@ -1,6 +1,7 @@
 """Snowflake Utilities"""
 
 import os
+from typing import Optional
 from snowflake.connector import connect, SnowflakeConnection as SnowConn
 from pydantic import SecretStr
 
@@ -17,6 +18,7 @@ class SnowflakeConnection:
         self.database = database if database else os.getenv("SNOWFLAKE_DATABASE")
         self.schema = schema if schema else os.getenv("SNOWFLAKE_SCHEMA")
         self.conn: SnowConn
+        self.query_id: Optional[str] = None
 
         if None in [self.user, self.password, self.account, self.warehouse, self.database]:
             raise ValueError(
@@ -49,6 +51,39 @@ class SnowflakeConnection:
         """Closes the Snowflake database connection."""
         self.conn.close()
 
+    def execute_query(self, query):
+        """Executes a SQL query and returns the results as a list of tuples.
+        The query is submitted asynchronously so its id is known and it can be cancelled with `interrupt`.
+        """
+        with self.conn.cursor() as cursor:
+            cursor.execute_async(query)
+            self.query_id = cursor.sfqid
+            try:
+                cursor.get_results_from_sfqid(self.query_id)
+                return cursor.fetchall()
+            finally:
+                self.query_id = None
+
+    def interrupt(self) -> None:
+        """Aborts the query that is currently running on the connection by its query id."""
+        if self.query_id:
+            with self.conn.cursor() as cursor:
+                cursor.execute(f"SELECT SYSTEM$CANCEL_QUERY('{self.query_id}')")
+
+    def reopen(self) -> None:
+        """Opens a new connection in place of the current one, e.g. after a query ignored `interrupt`.
+        The old connection is not closed, it still belongs to the thread that runs the stuck query.
+        """
+        self.__enter__()
+
+    def disable_result_cache(self) -> None:
+        """Stops Snowflake from answering repeated queries from its result cache for this session."""
+        self.execute_multiple_queries(["ALTER SESSION SET USE_CACHED_RESULT = FALSE"])
+
+    def set_statement_timeout(self, seconds: float) -> None:
+        """Makes Snowflake abort every query of this session that runs longer than `seconds`."""
+        self.execute_multiple_queries([f"ALTER SESSION SET STATEMENT_TIMEOUT_IN_SECONDS = {max(1, int(seconds))}"])
+
     def execute_multiple_queries(self, queries) -> None:
         """Executes multiple SQL queries that doesnt return anything"""
         for query in queries:
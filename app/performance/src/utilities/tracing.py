@@ -0,0 +1,360 @@
+"""Nested timing spans with background resource sampling.
+
+Spans can be opened with the `span` context manager or the `traced` decorator. They are a no-op until
+`start` is called, so library code can be instrumented unconditionally.
+Example usage:
+```python
+from performance.src.utilities import tracing
+
+tracing.start("trace.json", trace_format="chrome")
+with tracing.span("export", table="lineitem"):
+    ...
+tracing.finish()
+```
+Every process (including multiprocessing workers) appends finished spans to its own part file, while a
+background thread in the process that called `start` samples CPU, RSS and disk IO of itself and all of its
+child processes from `/proc`. `finish` merges everything into a single JSON or Chrome-trace
+(chrome://tracing, https://ui.perfetto.dev) file.
+With a `live_dir` the part files go to a session directory below it that is kept after `finish`, so the UI
+dashboard can follow the spans and samples of a running command.
+"""
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from pathlib import Path
+from typing import Dict, List, Literal, Optional, Tuple
+
+TRACE_PARTS_ENV = "DB_PERF_TRACE_PARTS"
+
+# Directory the live sessions are published in when the CLI runs with --live-dir, read by the UI dashboard
+DEFAULT_LIVE_DIR = ".results/live"
+
+# File written to a live session directory once the command has finished
+LIVE_DONE_MARKER = "done"
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+_CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+
+_local = threading.local()
+_lock = threading.Lock()
+_state: Dict = {
+    "parts_dir": None,
+    "pid": None,
+    "fp": None,
+    "output": None,
+    "format": None,
+    "sampler": None,
+    "live": False,
+}
+
+
+def _now_us() -> int:
+    """Returns the wall clock in microseconds, which lines up spans emitted by different processes."""
+    return time.time_ns() // 1000
+
+
+def _parts_dir() -> Optional[str]:
+    """Returns the directory collecting span part files, initialising spawned workers from the environment."""
+    if _state["parts_dir"] is None and os.environ.get(TRACE_PARTS_ENV):
+        _state["parts_dir"] = os.environ[TRACE_PARTS_ENV]
+    return _state["parts_dir"]
+
+
+def is_enabled() -> bool:
+    """Returns True when spans are being recorded in this process."""
+    return _parts_dir() is not None
+
+
+def _emit(event: Dict) -> None:
+    """Appends one trace event to this process' part file."""
+    with _lock:
+        if _state["pid"] != os.getpid():
+            # First event in this process, or we are a forked worker that inherited the parent's handle
+            _state["fp"] = open(Path(_parts_dir(), f"{os.getpid()}.jsonl"), "a", buffering=1)
+            _state["pid"] = os.getpid()
+        _state["fp"].write(json.dumps(event, default=str) + "\n")
+
+
+def _reset_after_fork() -> None:
+    """Gives a forked child its own lock and part file.
+    The fork may have happened while the sampler thread of the parent held the lock, which no thread of the child
+    would ever release.
+    """
+    global _lock
+    _lock = threading.Lock()
+    _state.update(pid=None, fp=None, sampler=None)
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def read_proc_io(pid: str = "self") -> Tuple[int, int]:
+    """Returns the (read_bytes, write_bytes) that hit the storage layer for a process, (0, 0) if unavailable."""
+    try:
+        with open(f"/proc/{pid}/io") as fp:
+            values = dict(line.split(": ") for line in fp.read().splitlines())
+        return int(values["read_bytes"]), int(values["write_bytes"])
+    except (OSError, KeyError, ValueError):
+        return 0, 0
+
+
+def read_proc_stat(pid: str = "self") -> Tuple[float, int]:
+    """Returns the (cpu_seconds, rss_bytes) of a process, (0.0, 0) if unavailable."""
+    try:
+        with open(f"/proc/{pid}/stat") as fp:
+            # The command name may contain spaces, the remaining fields start after its closing bracket
+            fields = fp.read().rsplit(")", 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / _CLOCK_TICKS, int(fields[21]) * _PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        return 0.0, 0
+
+
+@contextmanager
+def span(name: str, **attrs):
+    """Records the wall time, CPU time and disk IO of the enclosed block as a (possibly nested) span.
+    Extra keyword arguments are stored on the span, `attrs` can also be updated from inside the block,
+    e.g. to record the number of rows produced.
+    """
+    if not is_enabled():
+        yield attrs
+        return
+
+    stack: List[str] = _local.__dict__.setdefault("stack", [])
+    parent = stack[-1] if stack else None
+    stack.append(name)
+    cpu_start = os.times()
+    io_start = read_proc_io()
+    ts = _now_us()
+    started = time.perf_counter()
+    try:
+        yield attrs
+    except BaseException as e:
+        attrs["error"] = repr(e)
+        raise
+    finally:
+        duration = time.perf_counter() - started
+        cpu_end = os.times()
+        io_end = read_proc_io()
+        stack.pop()
+        _emit(
+            {
+                "name": name,
+                "cat": "span",
+                "ph": "X",
+                "ts": ts,
+                "dur": int(duration * 1_000_000),
+                "pid": os.getpid(),
+                "tid": threading.get_ident(),
+                "args": {
+                    **attrs,
+                    "parent": parent,
+                    "depth": len(stack),
+                    "cpu_user_s": round(cpu_end.user - cpu_start.user, 6),
+                    "cpu_system_s": round(cpu_end.system - cpu_start.system, 6),
+                    "read_bytes": io_end[0] - io_start[0],
+                    "write_bytes": io_end[1] - io_start[1],
+                },
+            }
+        )
+
+
+def counter(name: str, **values) -> None:
+    """Records numeric values at the current time as a counter event, e.g. the progress of a job."""
+    if is_enabled():
+        _emit({"name": name, "cat": "counter", "ph": "C", "ts": _now_us(), "pid": os.getpid(), "args": values})
+
+
+def traced(name: Optional[str] = None, **attrs):
+    """Decorator that wraps every call of the function in a span named after the function."""
+
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name or func.__qualname__, **attrs):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+class ResourceSampler(threading.Thread):
+    """Background thread that periodically samples host CPU and per-process CPU, RSS and disk IO from `/proc`
+    for the current process and all of its descendants and emits them as counter events.
+    """
+
+    def __init__(self, interval: float = 0.5):
+        """Initializes the sampler with the sampling interval in seconds."""
+        super().__init__(name="resource-sampler", daemon=True)
+        self.interval = interval
+        self.root_pid = os.getpid()
+        self._stop_event = threading.Event()
+        self._previous: Dict[int, Tuple[float, int, int]] = {}
+        self._previous_host: Optional[Tuple[int, int]] = None
+        self._previous_time = time.perf_counter()
+
+    def stop(self) -> None:
+        """Stops sampling and waits for the thread to exit."""
+        self._stop_event.set()
+        self.join()
+
+    def run(self) -> None:
+        """Samples until stopped."""
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.sample()
+            except Exception as e:
+                print(f"Resource sampling failed, disabling sampler: {e}", flush=True)
+                return
+
+    def descendants(self) -> List[int]:
+        """Returns the pids of the current process and all of its descendants."""
+        pids, pending = [], [self.root_pid]
+        while pending:
+            pid = pending.pop()
+            pids.append(pid)
+            try:
+                with open(f"/proc/{pid}/task/{pid}/children") as fp:
+                    pending.extend(int(child) for child in fp.read().split())
+            except OSError:
+                continue
+        return pids
+
+    def _host_cpu(self) -> Optional[float]:
+        """Returns the host CPU utilisation in percent since the previous sample."""
+        try:
+            with open("/proc/stat") as fp:
+                values = [int(v) for v in fp.readline().split()[1:]]
+        except (OSError, ValueError):
+            return None
+        idle, total = values[3] + values[4], sum(values)
+        previous, self._previous_host = self._previous_host, (idle, total)
+        if previous is None or total == previous[1]:
+            return None
+        return round(100 * (1 - (idle - previous[0]) / (total - previous[1])), 2)
+
+    def sample(self) -> None:
+        """Takes one sample of all tracked processes."""
+        now = time.perf_counter()
+        elapsed = max(now - self._previous_time, 1e-6)
+        self._previous_time = now
+        ts = _now_us()
+
+        current, totals = {}, {"cpu_pct": 0.0, "rss_mb": 0.0, "read_mb_s": 0.0, "write_mb_s": 0.0}
+        for pid in self.descendants():
+            cpu, rss = read_proc_stat(str(pid))
+            read_bytes, write_bytes = read_proc_io(str(pid))
+            current[pid] = (cpu, read_bytes, write_bytes)
+            previous = self._previous.get(pid)
+            stats = {"cpu_pct": 0.0, "rss_mb": round(rss / 1024**2, 2), "read_mb_s": 0.0, "write_mb_s": 0.0}
+            if previous:
+                stats["cpu_pct"] = round(100 * (cpu - previous[0]) / elapsed, 2)
+                stats["read_mb_s"] = round((read_bytes - previous[1]) / 1024**2 / elapsed, 2)
+                stats["write_mb_s"] = round((write_bytes - previous[2]) / 1024**2 / elapsed, 2)
+            for key, value in stats.items():
+                totals[key] += value
+            _emit({"name": "process", "cat": "sample", "ph": "C", "ts": ts, "pid": pid, "args": stats})
+        self._previous = current
+        totals = {key: round(value, 2) for key, value in totals.items()}
+
+        host_cpu = self._host_cpu()
+        if host_cpu is not None:
+            totals["host_cpu_pct"] = host_cpu
+        totals["processes"] = len(current)
+        _emit({"name": "resources", "cat": "sample", "ph": "C", "ts": ts, "pid": self.root_pid, "args": totals})
+
+
+def start(
+    output: Optional[str] = None,
+    trace_format: Literal["chrome", "json"] = "chrome",
+    sample_interval: float = 0.5,
+    live_dir: Optional[str] = None,
+) -> None:
+    """Enables span recording for this process and its future child processes.
+    A `sample_interval` of 0 disables the background resource sampler. Spans are merged into `output` by `finish`,
+    with `live_dir` they are also published in a new session directory below it while the command runs.
+    """
+    if is_enabled():
+        raise RuntimeError("Tracing has already been started in this process.")
+    if live_dir:
+        parts_dir = Path(live_dir, f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}")
+        parts_dir.mkdir(parents=True, exist_ok=True)
+        with open(Path(parts_dir, "session.json"), "w") as fp:
+            json.dump({"command": " ".join(sys.argv[1:]), "started": time.time(), "pid": os.getpid()}, fp)
+        parts_dir = str(parts_dir)
+    else:
+        parts_dir = tempfile.mkdtemp(prefix="db_perf_trace_")
+    os.environ[TRACE_PARTS_ENV] = parts_dir
+    _state.update(parts_dir=parts_dir, output=output, format=trace_format, live=bool(live_dir))
+    if sample_interval > 0 and Path("/proc/self/stat").exists():
+        _state["sampler"] = ResourceSampler(interval=sample_interval)
+        _state["sampler"].start()
+
+
+def _to_json(events: List[Dict]) -> Dict:
+    """Converts Chrome trace events to the flat JSON layout with seconds instead of microseconds."""
+    spans, samples = [], []
+    for event in events:
+        if event["ph"] == "X":
+            spans.append(
+                {
+                    "name": event["name"],
+                    "start": event["ts"] / 1_000_000,
+                    "duration_s": event["dur"] / 1_000_000,
+                    "pid": event["pid"],
+                    "tid": event["tid"],
+                    **event["args"],
+                }
+            )
+        else:
+            samples.append({"name": event["name"], "ts": event["ts"] / 1_000_000, "pid": event["pid"], **event["args"]})
+    return {"spans": spans, "samples": samples}
+
+
+def finish() -> Optional[str]:
+    """Stops the sampler, merges the part files of all processes into the trace file and returns its path.
+    A live session is marked as done instead of being removed, None is returned when there is no trace file.
+    """
+    if _state["parts_dir"] is None:
+        return None
+    if _state["sampler"] is not None:
+        _state["sampler"].stop()
+    with _lock:
+        if _state["fp"] is not None:
+            _state["fp"].close()
+
+    output = _merge() if _state["output"] else None
+    if _state["live"]:
+        Path(_state["parts_dir"], LIVE_DONE_MARKER).touch()
+    else:
+        shutil.rmtree(_state["parts_dir"], ignore_errors=True)
+    os.environ.pop(TRACE_PARTS_ENV, None)
+    _state.update(parts_dir=None, pid=None, fp=None, output=None, format=None, sampler=None, live=False)
+    return output
+
+
+def _merge() -> str:
+    """Merges the part files of all processes into the trace file and returns its path."""
+    events = []
+    for part in Path(_state["parts_dir"]).glob("*.jsonl"):
+        with open(part) as fp:
+            events.extend(json.loads(line) for line in fp if line.strip())
+    events.sort(key=lambda event: event["ts"])
+
+    output = Path(_state["output"])
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w") as fp:
+        if _state["format"] == "chrome":
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, fp)
+        else:
+            json.dump(_to_json(events), fp, indent=2)
+    print(f"Trace written to {output}", flush=True)
+    return str(output)
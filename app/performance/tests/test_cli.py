@@ -0,0 +1,16 @@
+"""Tests for the option checks of the benchmark CLI."""
+
+from typer.testing import CliRunner
+
+from performance.src.core.cli import app
+
+
+def test_queries_refuses_engines_without_connection(tmp_path):
+    """Engines that can only be translated to are refused before any engine runs or a result is recorded."""
+    results_db = tmp_path / "results.db"
+    result = CliRunner().invoke(
+        app, ["queries", "--engine", "duckdb", "--engine", "bigquery", "--results-db", str(results_db)]
+    )
+    assert result.exit_code == 2
+    assert "can't be run on bigquery" in result.output
+    assert not results_db.exists()
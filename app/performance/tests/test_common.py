@@ -0,0 +1,27 @@
+"""Tests for the common utilities."""
+
+from performance.src.utilities.common import format_table
+
+
+def test_format_table_without_rows():
+    """An empty result is printed as a placeholder instead of an empty table."""
+    assert format_table([]) == "(no rows)"
+
+
+def test_format_table_aligns_columns():
+    """Headers are left aligned, cells right aligned, floats rounded to 4 places and None shown as `-`."""
+    table = format_table(
+        [{"query_id": "1", "median_s": 0.123456, "rows": 10}, {"query_id": "22", "median_s": None, "rows": 1000}]
+    )
+    assert table.splitlines() == [
+        "query_id  median_s  rows",
+        "--------  --------  ----",
+        "       1    0.1235    10",
+        "      22         -  1000",
+    ]
+
+
+def test_format_table_uses_columns_of_first_row():
+    """Keys missing from later rows are printed as `-`, keys not in the first row are left out."""
+    table = format_table([{"a": 1}, {"b": 2}])
+    assert table.splitlines()[2:] == ["1", "-"]
@@ -0,0 +1,28 @@
+"""Tests for the generated employee data."""
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from performance.src.mock_data.employee.employee import generate_fake_employees, main
+from performance.src.utilities.handoff import open_published
+
+PERSON_COLUMNS = ["first_name", "last_name", "ssn", "address"]
+
+
+def generate_chunk(chunk: int, tmp_path) -> pa.Table:
+    """Generates a chunk of 100 employees and returns it as a table."""
+    options = {"chunk_rows": 100, "scale_factor": 1000, "pipeline": True, "spool_dir": tmp_path}
+    return open_published(generate_fake_employees((chunk, options)))
+
+
+def test_chunks_are_reproducible(tmp_path):
+    """A chunk generates the same employees every time, whichever worker runs it."""
+    assert generate_chunk(3, tmp_path).equals(generate_chunk(3, tmp_path))
+
+
+def test_employees_of_parallel_chunks_are_distinct(tmp_path):
+    """Chunks generated by forked workers don't repeat each other's people."""
+    main(scale_factor=3000, num_of_threads=2, chunk_rows=500, export_type="parquet", target_path=str(tmp_path))
+    employees = pq.read_table(str(tmp_path), columns=PERSON_COLUMNS).to_pylist()
+    assert len(employees) == 3000
+    assert len({tuple(employee.values()) for employee in employees}) == 3000
@@ -0,0 +1,121 @@
+"""Tests for the handoff of generated chunks to the single dataset writer."""
+
+import json
+import random
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.csv as csv
+import pyarrow.parquet as pq
+import pytest
+
+from performance.src.mock_data.employee.employee import EMPLOYEE_SCHEMA, generate_fake_employees
+from performance.src.utilities.handoff import MANIFEST_FILE, DatasetWriter, open_published, publish
+
+TARGET_FILE_BYTES = 256 * 1024
+
+
+def make_chunk(first_id: int, rows: int) -> pa.Table:
+    """Returns a chunk of rows with a shuffled key and a barely compressible text column."""
+    rng = random.Random(first_id)
+    ids = list(range(first_id, first_id + rows))
+    rng.shuffle(ids)
+    return pa.table(
+        {
+            "id": pa.array(ids, pa.int64()),
+            "text": [f"{rng.getrandbits(128):032x}" for _ in range(rows)],
+            "parent": pa.array([None if i < 10 else i // 2 for i in ids], pa.int64()),
+        }
+    )
+
+
+def read_dataset(path: Path, export_type: str) -> pa.Table:
+    """Reads all files of a written dataset in the order of the manifest."""
+    manifest = json.loads(Path(path, MANIFEST_FILE).read_text())
+    read = pq.read_table if export_type == "parquet" else csv.read_csv
+    return pa.concat_tables(read(str(Path(path, file["path"]))) for file in manifest["files"])
+
+
+def test_publish_and_consume(tmp_path):
+    """A published chunk is read back from its memory map and its spool file is removed once written."""
+    chunk = make_chunk(0, 100)
+    path = publish(chunk, tmp_path, "chunk_0")
+    assert open_published(path).equals(chunk)
+
+    writer = DatasetWriter(tmp_path / "out")
+    assert writer.consume(path) == 100
+    assert not Path(path).exists()
+    assert writer.close()["rows"] == 100
+
+
+def test_chunks_with_all_null_columns_use_the_given_schema(tmp_path):
+    """A first chunk whose column is all null (typed `null` by Arrow) doesn't break the later chunks."""
+    chunks = [pa.Table.from_pylist(make_chunk(first_id, 10).to_pylist()) for first_id in (0, 10, 20)]
+    assert chunks[0].schema.field("parent").type == pa.null()
+
+    schema = pa.schema([("id", pa.int64()), ("text", pa.string()), ("parent", pa.int64())])
+    writer = DatasetWriter(tmp_path, schema=schema)
+    for chunk in chunks:
+        writer.write(chunk)
+    writer.close()
+
+    dataset = read_dataset(tmp_path, "parquet")
+    assert dataset.schema.field("parent").type == pa.int64()
+    assert dataset["parent"].null_count == 10
+
+
+def test_chunks_that_dont_match_the_schema_are_reported(tmp_path):
+    """Without a schema the null typed column of the first chunk can't take the values of later chunks."""
+    writer = DatasetWriter(tmp_path)
+    writer.write(pa.table({"parent": pa.nulls(3)}))
+    with pytest.raises(ValueError, match="schema of the dataset"):
+        writer.write(pa.table({"parent": pa.array([1, 2, 3], pa.int64())}))
+
+
+def test_employee_chunks_have_the_employee_schema(tmp_path):
+    """The first employees have no manager, their chunk still has the schema of all other chunks."""
+    path = generate_fake_employees((0, {"chunk_rows": 10, "scale_factor": 20, "pipeline": True, "spool_dir": tmp_path}))
+    chunk = open_published(path)
+    assert chunk.schema == EMPLOYEE_SCHEMA
+    assert chunk["manager_id"].null_count == 10
+
+
+@pytest.mark.parametrize("export_type", ["parquet", "csv"])
+@pytest.mark.parametrize("sort_by", [None, "id"])
+def test_files_are_close_to_the_target_size(tmp_path, export_type, sort_by):
+    """Every file but the last is within 2% of the target size, the manifest lists all rows and bytes."""
+    writer = DatasetWriter(tmp_path, export_type, target_file_bytes=TARGET_FILE_BYTES, sort_by=sort_by)
+    for first_id in range(0, 60000, 5000):
+        chunk = make_chunk(first_id, 5000)
+        if sort_by:
+            writer.pending.append(chunk)
+        else:
+            writer.write(chunk)
+    manifest = writer.close()
+
+    assert len(manifest["files"]) > 3
+    for file in manifest["files"][:-1]:
+        assert abs(file["bytes"] / TARGET_FILE_BYTES - 1) < 0.02, file
+    assert manifest["rows"] == 60000
+    assert manifest["bytes"] == sum(path.stat().st_size for path in tmp_path.glob(f"part_*.{export_type}"))
+    assert read_dataset(tmp_path, export_type).num_rows == 60000
+
+
+def test_sorted_dataset(tmp_path):
+    """With a sort column the rows of all chunks are sorted globally and the files have disjoint key ranges."""
+    writer = DatasetWriter(tmp_path, target_file_bytes=TARGET_FILE_BYTES, sort_by="id")
+    for first_id in (20000, 0, 10000):
+        writer.consume(publish(make_chunk(first_id, 10000), tmp_path, f"chunk_{first_id}"))
+    manifest = writer.close()
+
+    assert read_dataset(tmp_path, "parquet")["id"].to_pylist() == list(range(30000))
+    ranges = [(file["min"], file["max"]) for file in manifest["files"]]
+    assert ranges[0][0] == 0 and ranges[-1][1] == 29999
+    assert all(previous[1] < current[0] for previous, current in zip(ranges, ranges[1:]))
+    assert not list(tmp_path.glob("*.arrow"))
+
+
+def test_unknown_sort_column_is_refused(tmp_path):
+    """A sort column that isn't in the schema fails before any chunk is written."""
+    with pytest.raises(ValueError, match="Sort column 'nope'"):
+        DatasetWriter(tmp_path, sort_by="nope", schema=EMPLOYEE_SCHEMA)
@@ -0,0 +1,104 @@
+"""Tests for the dry-run planner of the generators."""
+
+import shutil
+from collections import namedtuple
+from concurrent.futures import Future
+from pathlib import Path
+
+import pytest
+
+from performance.src.mock_data import planner
+
+DiskUsage = namedtuple("DiskUsage", ["total", "used", "free"])
+
+
+def test_fit_extrapolates_the_line_of_the_samples():
+    """The measurement grows along the line through the two samples."""
+    assert planner._fit(100, 200, 1, 2, 10) == pytest.approx(1000)
+    assert planner._fit(100, 200, 1, 2, 1.5) == pytest.approx(150)
+
+
+def test_fit_keeps_fixed_measurements_fixed():
+    """A measurement that doesn't grow (or shrinks by noise) stays at the bigger sample."""
+    assert planner._fit(25, 25, 0.01, 0.02, 100) == 25
+    assert planner._fit(30, 25, 0.01, 0.02, 100) == 25
+
+
+def test_fits_on_disk_sums_the_paths_of_one_filesystem(tmp_path, monkeypatch):
+    """Paths on the same filesystem share its free space, less the headroom, and may not exist yet."""
+    monkeypatch.setattr(shutil, "disk_usage", lambda path: DiskUsage(1000, 0, 1000))
+    assert planner.fits_on_disk({tmp_path / "out": 400, tmp_path / "tmp" / "nested": 400})
+    assert not planner.fits_on_disk({tmp_path / "out": 500, tmp_path / "tmp": 500})
+
+
+@pytest.mark.skipif(not Path("/dev/shm").is_dir(), reason="needs a shared memory filesystem")
+def test_fits_on_disk_checks_every_filesystem(tmp_path, monkeypatch):
+    """A request that fits on the target filesystem is still refused when the spool filesystem is too small."""
+    if Path("/dev/shm").stat().st_dev == tmp_path.stat().st_dev:
+        pytest.skip("the temp directory is on shared memory")
+    monkeypatch.setattr(
+        shutil, "disk_usage", lambda path: DiskUsage(0, 0, 100 if str(path).startswith("/dev/shm") else 10_000)
+    )
+    assert planner.fits_on_disk({tmp_path: 5000, "/dev/shm/spool": 50})
+    assert not planner.fits_on_disk({tmp_path: 5000, "/dev/shm/spool": 500})
+
+
+class FakePool:
+    """Process pool that returns the prepared samples instead of generating them."""
+
+    samples = iter([])
+
+    def __init__(self, max_workers):
+        """Initializes the fake pool."""
+
+    def __enter__(self):
+        """Returns the pool."""
+        return self
+
+    def __exit__(self, *args):
+        """Nothing to shut down."""
+
+    def submit(self, *args):
+        """Returns a future of the next prepared sample."""
+        future = Future()
+        future.set_result(next(self.samples))
+        return future
+
+
+def sample(scale, rows, spooled_bytes):
+    """Returns a measured employee sample with the given rows and spooled Arrow bytes."""
+    return {
+        "scale": scale,
+        "tables": {"employee": {"rows": rows, "bytes": rows * 100, "export_s": 0.0}},
+        "temp_bytes": spooled_bytes,
+        "generate_s": rows / 1000,
+        "baseline_rss": 0,
+        "memory_bytes": rows * 1000,
+    }
+
+
+@pytest.mark.parametrize(("sort_by", "spooled_rows"), [("employee_id", 1_000_000), (None, 4 * 10_000)])
+def test_pipeline_counts_the_spooled_chunks(tmp_path, monkeypatch, sort_by, spooled_rows):
+    """A sorted pipeline spools every chunk until the writer closes, otherwise only the chunks in flight, both
+    against the free space of the spool directory.
+    """
+    monkeypatch.setattr(planner, "ProcessPoolExecutor", FakePool)
+    monkeypatch.setattr(FakePool, "samples", iter([sample(500, 500, 500 * 300), sample(1000, 1000, 1000 * 300)]))
+    requirements = {}
+    monkeypatch.setattr(planner, "fits_on_disk", lambda required: requirements.update(required) or True)
+
+    plan = planner.plan_generation(
+        "employee",
+        scale_factor=1_000_000,
+        num_of_threads=2,
+        chunk_rows=10_000,
+        pipeline=True,
+        sort_by=sort_by,
+        target_path=str(tmp_path / "out"),
+        spool_dir=str(tmp_path / "spool"),
+    )
+
+    assert plan["spool_bytes"] == spooled_rows * 300
+    assert plan["spool_path"] == str(tmp_path / "spool")
+    assert requirements[str(tmp_path / "spool")] == spooled_rows * 300
+    assert requirements[str(tmp_path / "out")] == 1_000_000 * 100
@@ -0,0 +1,86 @@
+"""Tests for the guarded query runner."""
+
+import threading
+
+import pytest
+
+from performance.src.core import runner
+
+
+class FakeConnection:
+    """Connection wrapper whose `slow` query blocks until it is interrupted, or forever when `stuck`."""
+
+    def __init__(self, stuck: bool = False):
+        """Initializes the fake connection."""
+        self.stuck = stuck
+        self.interrupted = threading.Event()
+        self.release = threading.Event()
+        self.reopened = 0
+        self.timeouts = []
+
+    def execute_query(self, query):
+        """Returns one row, the `slow` query only returns once it was interrupted (or released)."""
+        if query == "slow":
+            (self.release if self.stuck else self.interrupted).wait()
+            raise RuntimeError("INTERRUPT Error: Interrupted!")
+        return [(1,)]
+
+    def interrupt(self):
+        """Cancels the running query unless the connection is stuck."""
+        self.interrupted.set()
+
+    def set_statement_timeout(self, seconds):
+        """Records the statement timeouts pushed to the engine."""
+        self.timeouts.append(seconds)
+
+    def reopen(self):
+        """Counts the new connections."""
+        self.reopened += 1
+
+
+@pytest.mark.parametrize(
+    ("error", "status"),
+    [
+        (RuntimeError("Out of Memory Error: failed to allocate data of size 1.0 GiB"), "memory_limit"),
+        (type("OutOfMemoryException", (Exception,), {})("could not allocate"), "memory_limit"),
+        (type("QueryCanceled", (Exception,), {})("canceling statement due to statement timeout"), "timeout"),
+        (
+            RuntimeError("000630 (57014): Statement reached its statement or warehouse timeout of 1 second(s)"),
+            "timeout",
+        ),
+        (type("QueryCanceled", (Exception,), {})("canceling statement due to user request"), "error"),
+        (RuntimeError("could not connect to server: Connection timed out"), "error"),
+        (TimeoutError("timeout expired"), "error"),
+        (ValueError("Catalog Error: Table with name missing does not exist!"), "error"),
+    ],
+)
+def test_classify_error(error, status):
+    """Only memory errors and the engines' statement timeouts get their own status."""
+    assert runner.classify_error(error) == status
+
+
+def test_timed_out_query_is_interrupted():
+    """A query over its timeout is interrupted and recorded as `timeout`, the run goes on."""
+    connection = FakeConnection()
+    results = runner.run_queries(connection, {"1": "slow", "2": "fast"}, timeout=0.2)
+
+    assert [(result["query_id"], result["status"]) for result in results] == [("1", "timeout"), ("2", "ok")]
+    assert connection.interrupted.is_set()
+    assert connection.reopened == 0
+
+
+def test_stuck_query_is_abandoned(monkeypatch):
+    """A query that ignores the interrupt is abandoned, the connection is reopened with its limits and the
+    remaining queries still run.
+    """
+    monkeypatch.setattr(runner, "INTERRUPT_GRACE_PERIOD", 0.2)
+    connection = FakeConnection(stuck=True)
+    try:
+        results = runner.run_queries(connection, {"1": "slow", "2": "fast"}, timeout=0.2)
+    finally:
+        connection.release.set()
+
+    assert [(result["query_id"], result["status"]) for result in results] == [("1", "abandoned"), ("2", "ok")]
+    assert results[0]["error"].startswith("timeout")
+    assert connection.reopened == 1
+    assert connection.timeouts == [0.2, 0.2]
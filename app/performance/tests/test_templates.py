@@ -0,0 +1,85 @@
+"""Tests for the parameterized query templates."""
+
+import random
+from datetime import date
+from decimal import Decimal
+
+import pytest
+from jinja2 import UndefinedError
+
+from performance.src.core import templates
+from performance.src.enums import DBType
+
+CANDIDATES = {"year": [1998, 1999, 2000, 2001, 2002], "state": ["CA", "NY", "TX"]}
+
+
+def test_parameter_domain():
+    """Numbered parameters share the domain of their prefix, other names are their own domain."""
+    assert templates.parameter_domain("state_2") == "state"
+    assert templates.parameter_domain("manager_id") == "manager_id"
+    assert templates.parameter_domain("year") == "year"
+
+
+def test_template_parameters():
+    """The parameters of a template are found by name and returned sorted."""
+    template = "SELECT * FROM t WHERE y = {{ year }} AND s IN ({{ state_2 }}, {{ state_1 }})"
+    assert templates.template_parameters(template) == ["state_1", "state_2", "year"]
+
+
+@pytest.mark.parametrize(
+    ("value", "literal"),
+    [
+        (None, "NULL"),
+        (True, "TRUE"),
+        (7, "7"),
+        (Decimal("1.50"), "1.50"),
+        (date(2001, 3, 4), "DATE '2001-03-04'"),
+        ("O'Brien", "'O''Brien'"),
+    ],
+)
+def test_sql_literal(value, literal):
+    """Values are rendered as SQL literals with quotes escaped."""
+    assert templates.sql_literal(value) == literal
+
+
+def test_render_fails_on_missing_parameters():
+    """Rendering strips the trailing semicolon and refuses templates with parameters left undefined."""
+    assert templates.render("SELECT {{ year }};\n", {"year": "2000"}) == "SELECT 2000"
+    with pytest.raises(UndefinedError):
+        templates.render("SELECT {{ year }}", {})
+
+
+def test_draw_parameters_is_reproducible():
+    """The same seed draws the same values, so a stream can be replayed."""
+    names = ["state_1", "state_2", "year"]
+    first = templates.draw_parameters(names, CANDIDATES, random.Random("0:0:42"))
+    assert first == templates.draw_parameters(names, CANDIDATES, random.Random("0:0:42"))
+    assert first["year"] in CANDIDATES["year"]
+
+
+def test_draw_parameters_differs_between_streams():
+    """Streams draw their variants with their own seeds and don't repeat each other's parameter sets."""
+    streams = [random.Random(f"0:{stream}:42") for stream in range(2)]
+    variants = [[templates.draw_parameters(["year", "state_1"], CANDIDATES, rng) for _ in range(5)] for rng in streams]
+    assert variants[0] != variants[1]
+
+
+def test_draw_parameters_of_one_domain_are_distinct():
+    """Parameters of the same domain get distinct values while the domain has enough of them."""
+    for seed in range(20):
+        values = templates.draw_parameters(["state_1", "state_2", "state_3"], CANDIDATES, random.Random(seed))
+        assert sorted(values.values()) == sorted(CANDIDATES["state"])
+
+
+def test_draw_parameters_repeats_values_of_small_domains():
+    """A domain with fewer values than parameters repeats values instead of failing."""
+    values = templates.draw_parameters(["state_1", "state_2"], {"state": ["CA"]}, random.Random(0))
+    assert values == {"state_1": "CA", "state_2": "CA"}
+
+
+def test_translate_prepared_keeps_markers():
+    """The `$n` markers survive the translation to another dialect, so the query can be prepared."""
+    query = "SELECT count(*) FROM store_sales WHERE ss_quantity BETWEEN $1 AND $2"
+    assert templates.translate_prepared(query, DBType.DUCKDB) == query
+    translated = templates.translate_prepared(query, DBType.POSTGRESQL)
+    assert "$1" in translated and "$2" in translated
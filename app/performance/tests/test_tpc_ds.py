@@ -0,0 +1,43 @@
+"""Tests for the chunked export of the TPC-DS tables."""
+
+import duckdb
+
+from performance.src.mock_data.tpc import tpc_ds
+
+
+def test_big_tables_are_split_into_row_ranges(monkeypatch):
+    """Tables bigger than a chunk are split into consecutive rowid ranges that cover all rows, biggest first."""
+    monkeypatch.setattr(tpc_ds, "MIN_CHUNK_ROWS", 10)
+    chunks = tpc_ds.table_chunks([("store_sales", 95), ("item", 8), ("inventory", 25)], workers=2)
+
+    assert chunks[0][2] >= chunks[-1][2]
+    assert [chunk for chunk in chunks if chunk[0] == "item"] == [("item", 0, 8, None)]
+    for table, rows in (("store_sales", 95), ("inventory", 25)):
+        ranges = sorted((first_row, first_row + count) for name, first_row, count, _ in chunks if name == table)
+        assert ranges[0][0] == 0 and ranges[-1][1] == rows
+        assert all(previous[1] == current[0] for previous, current in zip(ranges, ranges[1:]))
+
+
+def test_partitioned_tables_stay_whole(monkeypatch):
+    """A table with a partition column is exported as one chunk, its partitions split it into files."""
+    monkeypatch.setattr(tpc_ds, "MIN_CHUNK_ROWS", 10)
+    chunks = tpc_ds.table_chunks([("store_sales", 95)], workers=2, partition_columns=["store_sales=ss_store_sk"])
+    assert chunks == [("store_sales", 0, 95, None)]
+
+
+def test_exported_chunks_hold_every_row_once(tmp_path, monkeypatch):
+    """The files of the chunks of a table hold every row exactly once."""
+    monkeypatch.setattr(tpc_ds, "MIN_CHUNK_ROWS", 10)
+    database = tmp_path / "tpc_ds.db"
+    with duckdb.connect(str(database)) as connection:
+        connection.execute("CREATE TABLE store_sales AS SELECT range AS ss_ticket_number FROM range(95)")
+
+    options = {"db_file_path": database, "export_type": "parquet", "target_path": str(tmp_path / "out")}
+    chunks = tpc_ds.table_chunks([("store_sales", 95)], workers=2)
+    for chunk in chunks:
+        assert tpc_ds.export_tpc_ds_table((*chunk, options)) == chunk[2]
+
+    files = sorted(path.name for path in (tmp_path / "out" / "store_sales").iterdir())
+    assert len(files) == len(chunks) > 1 and files[0] == "store_sales_0.parquet"
+    rows = duckdb.sql(f"SELECT ss_ticket_number FROM '{tmp_path}/out/store_sales/*.parquet' ORDER BY 1").fetchall()
+    assert [row for (row,) in rows] == list(range(95))
@@ -0,0 +1,83 @@
+"""Tests for the nested timing spans and the merge of the part files of all processes."""
+
+import json
+import multiprocessing
+import os
+import signal
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+from performance.src.utilities import tracing
+
+
+@pytest.fixture
+def trace(tmp_path, request):
+    """Starts tracing into a trace file of the requested format and finishes it if a test didn't."""
+    output = tmp_path / "trace.json"
+    tracing.start(str(output), trace_format=getattr(request, "param", "json"), sample_interval=0)
+    yield output
+    tracing.finish()
+
+
+def export_in_worker(table: str) -> int:
+    """Records a span in a pool worker and returns the worker's pid."""
+    with tracing.span("export", table=table):
+        return os.getpid()
+
+
+def test_nested_spans_record_parent_and_depth(trace):
+    """Inner spans name the span they were opened in and their nesting depth."""
+    with tracing.span("outer"):
+        with tracing.span("inner", table="lineitem") as attrs:
+            attrs["rows"] = 3
+    tracing.finish()
+
+    spans = {span["name"]: span for span in json.loads(trace.read_text())["spans"]}
+    assert (spans["outer"]["parent"], spans["outer"]["depth"]) == (None, 0)
+    assert (spans["inner"]["parent"], spans["inner"]["depth"]) == ("outer", 1)
+    assert spans["inner"]["rows"] == 3 and spans["inner"]["table"] == "lineitem"
+
+
+@pytest.mark.parametrize("trace", ["chrome", "json"], indirect=True)
+def test_spans_of_forked_workers_are_merged(trace):
+    """The part files written by forked pool workers end up in the merged trace of either format."""
+    with ProcessPoolExecutor(max_workers=2, mp_context=multiprocessing.get_context("fork")) as pool:
+        worker_pids = set(pool.map(export_in_worker, ["store_sales", "item", "inventory"]))
+    with tracing.span("parent"):
+        pass
+    tracing.finish()
+
+    merged = json.loads(trace.read_text())
+    if "traceEvents" in merged:
+        spans = [{**event["args"], "name": event["name"], "pid": event["pid"]} for event in merged["traceEvents"]]
+    else:
+        spans = merged["spans"]
+    exports = [span for span in spans if span["name"] == "export"]
+    assert sorted(span["table"] for span in exports) == ["inventory", "item", "store_sales"]
+    assert {span["pid"] for span in exports} == worker_pids
+    assert os.getpid() not in worker_pids
+    assert [span["pid"] for span in spans if span["name"] == "parent"] == [os.getpid()]
+
+
+def test_fork_while_the_lock_is_held_doesnt_deadlock(trace):
+    """A child forked while the parent holds the lock (e.g. in its sampler thread) can still record spans."""
+    with tracing._lock:
+        pid = os.fork()
+        if pid == 0:
+            try:
+                with tracing.span("child"):
+                    pass
+            finally:
+                os._exit(0)
+        deadline = time.monotonic() + 10
+        while os.waitpid(pid, os.WNOHANG) == (0, 0):
+            if time.monotonic() > deadline:
+                os.kill(pid, signal.SIGKILL)
+                os.waitpid(pid, 0)
+                pytest.fail("the forked child deadlocked on the tracing lock")
+            time.sleep(0.05)
+    tracing.finish()
+
+    assert [span["pid"] for span in json.loads(trace.read_text())["spans"]] == [pid]
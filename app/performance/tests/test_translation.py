@@ -0,0 +1,91 @@
+"""Tests for the cached dialect translation of query suites."""
+
+from pathlib import Path
+
+import duckdb
+import sqlglot
+
+from performance.src.core import translation
+from performance.src.enums import DBType
+
+GOOD_QUERY = "SELECT 42 AS answer"
+BROKEN_QUERY = "SELECT (1 FROM"
+
+
+def write_suite(path: Path, queries: dict) -> Path:
+    """Writes a query suite with one `<query_id>.sql` file per query."""
+    path.mkdir(parents=True, exist_ok=True)
+    for query_id, query in queries.items():
+        Path(path, f"{query_id}.sql").write_text(query)
+    return path
+
+
+def test_duckdb_queries_are_not_translated(tmp_path):
+    """DuckDB is the source dialect, its queries are returned unchanged and nothing is cached."""
+    assert translation.translate_query(GOOD_QUERY, DBType.DUCKDB, tmp_path) == GOOD_QUERY
+    assert not any(tmp_path.iterdir())
+
+
+def test_translation_is_cached(tmp_path):
+    """A second translation of the same query is read from the cache file."""
+    translated = translation.translate_query(GOOD_QUERY, DBType.POSTGRESQL, tmp_path)
+    cached = list(Path(tmp_path, DBType.POSTGRESQL.value).glob("*.sql"))
+    assert len(cached) == 1
+    assert cached[0].read_text() == translated
+
+    cached[0].write_text("SELECT 'from cache'")
+    assert translation.translate_query(GOOD_QUERY, DBType.POSTGRESQL, tmp_path) == "SELECT 'from cache'"
+
+
+def test_translation_cache_is_keyed_to_sqlglot_version(tmp_path, monkeypatch):
+    """Upgrading sqlglot translates the query again instead of reusing the old translation."""
+    translation.translate_query(GOOD_QUERY, DBType.POSTGRESQL, tmp_path)
+    monkeypatch.setattr(sqlglot, "__version__", "0.0.0-test")
+    translation.translate_query(GOOD_QUERY, DBType.POSTGRESQL, tmp_path)
+    assert len(list(Path(tmp_path, DBType.POSTGRESQL.value).glob("*.sql"))) == 2
+
+
+def test_load_exclusions(tmp_path):
+    """Exclusion lists hold one query id per line with an optional reason, blank lines are ignored."""
+    path = translation.exclusion_file(tmp_path, DBType.POSTGRESQL)
+    path.parent.mkdir()
+    path.write_text("14  # uses a DuckDB only function\n\n23\n")
+    assert translation.load_exclusions(tmp_path, DBType.POSTGRESQL) == {"14": "uses a DuckDB only function", "23": ""}
+    assert translation.load_exclusions(tmp_path, DBType.SNOWFLAKE) == {}
+
+
+def test_add_exclusions_skips_excluded_queries(tmp_path):
+    """Queries that are already excluded are not added twice and reasons are kept on a single line."""
+    translation.add_exclusions(tmp_path, DBType.POSTGRESQL, {"1": "first"})
+    translation.add_exclusions(tmp_path, DBType.POSTGRESQL, {"1": "again", "2": "multi\nline   reason"})
+    assert translation.exclusion_file(tmp_path, DBType.POSTGRESQL).read_text().splitlines() == [
+        "1  # first",
+        "2  # multi line reason",
+    ]
+
+
+def test_translate_suite_skips_failed_queries_without_excluding_them(tmp_path, capsys):
+    """Translation failures are skipped and reported but never written to the tracked exclusion list."""
+    sql_path = write_suite(tmp_path / "suite", {"1": GOOD_QUERY, "2": BROKEN_QUERY, "3": GOOD_QUERY})
+    translation.add_exclusions(sql_path, DBType.POSTGRESQL, {"3": "excluded by hand"})
+
+    queries, skipped = translation.translate_suite(sql_path, DBType.POSTGRESQL, cache_dir=tmp_path / "cache")
+
+    assert list(queries) == ["1"]
+    assert skipped["3"] == "excluded by hand"
+    assert skipped["2"].startswith("translation failed")
+    assert translation.load_exclusions(sql_path, DBType.POSTGRESQL) == {"3": "excluded by hand"}
+    assert "skipping query 2, translation failed" in capsys.readouterr().out
+
+
+def test_verify_translation_reports_failing_queries(tmp_path):
+    """Queries that fail to translate or whose original fails in DuckDB are reported instead of raising."""
+    database = str(tmp_path / "verify.db")
+    duckdb.connect(database).close()
+    sql_path = write_suite(tmp_path / "suite", {"1": GOOD_QUERY, "2": BROKEN_QUERY, "3": "SELECT * FROM missing_table"})
+
+    problems = translation.verify_translation(database, sql_path, cache_dir=tmp_path / "cache")
+
+    assert sorted(problems) == ["2", "3"]
+    assert problems["2"].startswith("translation failed")
+    assert problems["3"].startswith("original query failed")
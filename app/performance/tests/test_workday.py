@@ -0,0 +1,35 @@
+"""Tests for the Workday data generated from the dbt_workday seeds."""
+
+import duckdb
+import pytest
+
+from performance.src.mock_data.employee import workday
+
+
+def test_load_seeds_never_clones_without_refresh(tmp_path, monkeypatch):
+    """Seeds are read from the given directory, an empty one is reported instead of cloning dbt_workday."""
+    monkeypatch.setattr(workday, "GIT_URL", "https://invalid.example/dbt_workday.git")
+    with pytest.raises(FileNotFoundError, match="--refresh-seeds"):
+        workday.load_seeds(tmp_path)
+
+    (tmp_path / "workday_worker_data.csv").write_text("id,name\n1,a\n")
+    assert workday.load_seeds(tmp_path) == tmp_path
+
+
+def test_amplified_keys_join_within_a_replica(tmp_path):
+    """Every replica remaps the keys of all tables the same way, so the replicas join up on their own."""
+    seeds = tmp_path / "seeds"
+    seeds.mkdir()
+    (seeds / "workday_worker_data.csv").write_text("id,name,position_id\n1,a,10\n2,b,11\n")
+    (seeds / "workday_position_data.csv").write_text("position_id,worker_id,title\n10,1,x\n11,2,y\n")
+    (tmp_path / "out").mkdir()
+    workday.amplify(seeds, tmp_path / "out", factor=3, export_type="parquet", partitions=2)
+
+    worker, position = (
+        f"read_parquet('{tmp_path}/out/{table}/*/*.parquet')"
+        for table in ("workday_worker_data", "workday_position_data")
+    )
+    joined = duckdb.sql(
+        f"SELECT count(*) FROM {worker} w JOIN {position} p ON w.position_id = p.position_id AND w.id = p.worker_id"
+    ).fetchone()
+    assert joined == (6,)
@@ -1 +1,131 @@
 """API endpoints"""
+
+import asyncio
+import json
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
+
+from ui.src import utilities
+
+router = APIRouter(prefix="/api")
+
+# Seconds between two checks of a live session for new events
+SSE_POLL_INTERVAL = 0.5
+
+# Per process samples are only needed in merged traces, the dashboard shows the `resources` totals
+SKIPPED_EVENTS = {"process"}
+
+# Timestamps are returned as ISO strings, the dashboard only displays them
+RUNS_QUERY = """SELECT
+        run_id,
+        min(started_at)::VARCHAR AS started_at,
+        string_agg(DISTINCT engine, ',') AS engines,
+        string_agg(DISTINCT mode, ',') AS modes,
+        count(DISTINCT query_id) AS queries,
+        count(*) AS executions,
+        count(*) FILTER (WHERE status = 'ok') AS ok,
+        sum(elapsed_s) AS total_s
+    FROM query_runs
+    GROUP BY run_id
+    ORDER BY min(query_runs.started_at) DESC
+    LIMIT ? OFFSET ?"""
+
+RUN_QUERIES_QUERY = """SELECT
+        query_id,
+        engine,
+        mode,
+        count(*) AS executions,
+        median(elapsed_s) FILTER (WHERE status = 'ok') AS median_s,
+        quantile_cont(elapsed_s, 0.95) FILTER (WHERE status = 'ok') AS p95_s,
+        min(elapsed_s) FILTER (WHERE status = 'ok') AS min_s,
+        max(elapsed_s) FILTER (WHERE status = 'ok') AS max_s,
+        string_agg(DISTINCT status, ',') AS statuses
+    FROM query_runs
+    WHERE run_id = ?
+    GROUP BY query_id, engine, mode
+    ORDER BY TRY_CAST(query_id AS INTEGER) NULLS LAST, query_id, engine, mode"""
+
+RUN_TIMELINE_QUERY = """SELECT
+        time_bucket(to_seconds(?), started_at)::VARCHAR AS bucket,
+        engine,
+        count(*) AS executions,
+        count(*) / ? AS queries_per_s,
+        median(elapsed_s) AS median_s
+    FROM query_runs
+    WHERE run_id = ?
+    GROUP BY ALL
+    ORDER BY bucket, engine"""
+
+QUERY_HISTORY_QUERY = """SELECT run_id, engine, started_at::VARCHAR AS started_at, median_s, executions FROM (
+        SELECT run_id, engine, min(started_at) AS started_at, median(elapsed_s) AS median_s, count(*) AS executions
+        FROM query_runs
+        WHERE query_id = ? AND status = 'ok' AND (? IS NULL OR engine = ?)
+        GROUP BY run_id, engine
+        ORDER BY started_at DESC
+        LIMIT ?
+    )
+    ORDER BY started_at"""
+
+
+@router.get("/live/sessions")
+def live_sessions() -> List[Dict]:
+    """Lists the most recent sessions published by CLI commands that ran with `--live-dir`."""
+    return utilities.live_sessions()
+
+
+async def _stream_events(directory: Path, request: Request):
+    """Yields the new events of a live session as server-sent events until the command finishes."""
+    offsets = {}
+    while not await request.is_disconnected():
+        # Checked before reading, so the events written just before the command finished are still sent
+        done = utilities.session_done(directory)
+        for part in sorted(directory.glob("*.jsonl")):
+            events, offsets[part] = utilities.read_new_events(part, offsets.get(part, 0))
+            events = [event for event in events if event["name"] not in SKIPPED_EVENTS]
+            if events:
+                yield f"data: {json.dumps(events, default=str)}\n\n"
+        if done:
+            yield "event: done\ndata: {}\n\n"
+            return
+        yield ": keep-alive\n\n"
+        await asyncio.sleep(SSE_POLL_INTERVAL)
+
+
+@router.get("/live/sessions/{session_id}/events")
+async def live_events(session_id: str, request: Request) -> StreamingResponse:
+    """Streams the spans, progress counters and resource samples of a live session, from its start."""
+    directory = utilities.session_directory(session_id)
+    if directory is None:
+        raise HTTPException(status_code=404, detail=f"Live session {session_id} not found")
+    return StreamingResponse(
+        _stream_events(directory, request),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/history/runs")
+def runs(limit: int = 50, offset: int = 0) -> List[Dict]:
+    """Lists recorded runs, newest first, with their totals aggregated in the results store."""
+    return utilities.query_results_store(RUNS_QUERY, [limit, offset])
+
+
+@router.get("/history/runs/{run_id}/queries")
+def run_queries(run_id: str) -> List[Dict]:
+    """Returns the latency statistics of every query of a run per engine and mode."""
+    return utilities.query_results_store(RUN_QUERIES_QUERY, [run_id])
+
+
+@router.get("/history/runs/{run_id}/timeline")
+def run_timeline(run_id: str, bucket_s: int = 10) -> List[Dict]:
+    """Returns the query throughput and median latency of a run over time, in buckets of `bucket_s` seconds."""
+    return utilities.query_results_store(RUN_TIMELINE_QUERY, [bucket_s, bucket_s, run_id])
+
+
+@router.get("/history/queries/{query_id}")
+def query_history(query_id: str, engine: Optional[str] = None, limit: int = 100) -> List[Dict]:
+    """Returns the median latency of a query in each of its `limit` most recent runs."""
+    return utilities.query_results_store(QUERY_HISTORY_QUERY, [query_id, engine, engine, limit])
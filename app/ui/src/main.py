@@ -1 +1,22 @@
 """Main module that exposes the UI application."""
+
+from pathlib import Path
+
+from fastapi import FastAPI, Request
+from fastapi.staticfiles import StaticFiles
+from fastapi.templating import Jinja2Templates
+
+from ui.src.api import router
+
+templates = Jinja2Templates(directory=Path(__file__).parent.parent / "templates")
+
+app = FastAPI(title="DB Performance Dashboard")
+app.include_router(router)
+# Vendored front end libraries (Chart.js), so the dashboard works without internet access
+app.mount("/static", StaticFiles(directory=Path(__file__).parent.parent / "static"), name="static")
+
+
+@app.get("/", include_in_schema=False)
+def index(request: Request):
+    """Renders the dashboard with the live sessions and the historical runs."""
+    return templates.TemplateResponse(request, "index.html", {"title": app.title})
@@ -1 +1,85 @@
 """common utilities"""
+
+import json
+import os
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from duckdb import IOException
+
+from performance.src.core.results import DEFAULT_RESULTS_DATABASE
+from performance.src.utilities.duckdb import DuckDBConnection
+from performance.src.utilities.tracing import DEFAULT_LIVE_DIR, LIVE_DONE_MARKER
+
+# Attempts to open the results store while a benchmark holds it open for writing
+LOCK_RETRIES = 20
+LOCK_RETRY_INTERVAL = 0.05
+
+
+def results_database() -> Path:
+    """Returns the results store the dashboard reads the historical runs from."""
+    return Path(os.getenv("DB_PERF_RESULTS_DB", DEFAULT_RESULTS_DATABASE))
+
+
+def live_directory() -> Path:
+    """Returns the directory the CLI publishes live sessions in (`--live-dir`)."""
+    return Path(os.getenv("DB_PERF_LIVE_DIR", DEFAULT_LIVE_DIR))
+
+
+def query_results_store(query: str, parameters: Optional[List] = None) -> List[Dict]:
+    """Runs a query on the results store opened read only and returns its rows as dicts.
+    Queries are expected to aggregate in DuckDB so only small results reach Python. A benchmark only holds the
+    store open while it records results, so opening it is retried for a moment.
+    """
+    database = results_database()
+    if not database.exists():
+        return []
+    for attempt in range(LOCK_RETRIES):
+        try:
+            with DuckDBConnection(database=database, read_only=True) as duckdb:
+                cursor = duckdb.conn.execute(query, parameters or [])
+                names = [column[0] for column in cursor.description]
+                return [dict(zip(names, row)) for row in cursor.fetchall()]
+        except IOException:
+            if attempt == LOCK_RETRIES - 1:
+                raise
+            time.sleep(LOCK_RETRY_INTERVAL)
+    return []
+
+
+def session_directory(session_id: str) -> Optional[Path]:
+    """Returns the directory of a live session, None if there is no such session."""
+    directory = Path(live_directory(), session_id)
+    if directory.resolve().parent != live_directory().resolve() or not Path(directory, "session.json").exists():
+        return None
+    return directory
+
+
+def session_done(directory: Path) -> bool:
+    """Returns True when the command of a live session has finished (or died without finishing the session)."""
+    if Path(directory, LIVE_DONE_MARKER).exists():
+        return True
+    with open(Path(directory, "session.json")) as fp:
+        pid = json.load(fp).get("pid")
+    return pid is not None and not Path(f"/proc/{pid}").exists()
+
+
+def live_sessions(limit: int = 50) -> List[Dict]:
+    """Returns the most recent live sessions, newest first."""
+    sessions = []
+    for path in sorted(live_directory().glob("*/session.json"), reverse=True)[:limit]:
+        with open(path) as fp:
+            session = json.load(fp)
+        sessions.append({"id": path.parent.name, **session, "done": session_done(path.parent)})
+    return sessions
+
+
+def read_new_events(part: Path, offset: int) -> Tuple[List[Dict], int]:
+    """Returns the events of the complete lines appended to a part file since `offset`, and the new offset."""
+    with open(part, "rb") as fp:
+        fp.seek(offset)
+        data = fp.read()
+    # A line the writer hasn't finished yet is read again on the next call
+    end = data.rfind(b"\n") + 1
+    return [json.loads(line) for line in data[:end].splitlines() if line.strip()], offset + end
@@ -0,0 +1,20 @@
+"""Tests for the dashboard page of the UI application."""
+
+import re
+
+from fastapi.testclient import TestClient
+
+from ui.src.main import app
+
+
+def test_dashboard_loads_chart_js_from_the_app():
+    """The dashboard only loads scripts served by the app itself, so its charts work without internet access."""
+    client = TestClient(app)
+    page = client.get("/")
+    scripts = re.findall(r'<script src="([^"]+)"', page.text)
+    assert scripts and all(script.startswith(str(client.base_url)) for script in scripts)
+
+    for script in scripts:
+        response = client.get(script)
+        assert response.status_code == 200
+        assert "window.Chart" in response.text